@@ -0,0 +1,36 @@
+import json
+import sys
+from typing import List, Optional
+
+import click
+
+from pnp_toolkit.core.bench import synthetic_decks, run_benchmarks, DEFAULT_BENCH_REPEAT, BenchResult
+
+BENCH_DECK_NAMES = [deck.name for deck in synthetic_decks(scale=0)]
+
+
+@click.command()
+@click.option("--deck", "deck_names", type=click.Choice(BENCH_DECK_NAMES), multiple=True,
+              help="Synthetic deck to measure, can be repeated (all decks by default)")
+@click.option("--repeat", type=click.IntRange(min=1), default=DEFAULT_BENCH_REPEAT,
+              help="Runs of every benchmark, the fastest run is reported")
+@click.option("--scale", type=click.FloatRange(min=0, min_open=True), default=1.0,
+              help="Multiplier of item counts in synthetic decks")
+@click.option("--no-render", is_flag=True, default=False, help="Measure only pack strategies")
+@click.option("--output", type=click.Path(dir_okay=False, file_okay=True), default=None,
+              help="Write JSON report to file instead of stdout")
+def bench(deck_names: List[str], *, repeat: int, scale: float, no_render: bool, output: Optional[str]):
+    """ Measure throughput of pack strategies and renderers on synthetic decks """
+    decks = [deck for deck in synthetic_decks(scale) if not deck_names or deck.name in deck_names]
+
+    def progress(result: BenchResult):
+        click.echo(f"{result.benchmark:<7} {result.target:<27} {result.deck:<17} "
+                   f"{result.items_per_sec:>10.1f} items/sec", err=True)
+
+    report = json.dumps(run_benchmarks(decks, repeat=repeat, render=not no_render, progress=progress), indent=2)
+
+    if output:
+        with open(output, "w") as output_file:
+            output_file.write(report + "\n")
+    else:
+        sys.stdout.write(report + "\n")
@@ -1,3 +1,4 @@
+import json
 import logging
 from pathlib import Path
 from typing import List
@@ -5,21 +6,57 @@ from typing import List
 import click
 from tqdm import tqdm
 
-from pnp_toolkit.core.pipeline.build import BuildPipeline
+from pnp_toolkit.core.pipeline.build import BuildPipeline, EXECUTOR_TYPES
+from pnp_toolkit.core.render.image_cache import DEFAULT_IMAGE_CACHE_SIZE
 from pnp_toolkit.core.spec.yaml_parse import parse_from_yaml
+from pnp_toolkit.core.utils import parse_size_bytes
 
 
 @click.command()
 @click.option("--spec-file", type=click.Path(exists=True, dir_okay=False, file_okay=True), default="BGSpec.yml")
+@click.option("--executor", type=click.Choice(EXECUTOR_TYPES), default="thread",
+              help="Run each document in thread (default) or in separate worker process")
+@click.option("--image-cache-dir", type=click.Path(file_okay=False, dir_okay=True), default=None,
+              help="Directory for persistent cache of preprocessed images (disabled by default)")
+@click.option("--image-cache-size", default=str(DEFAULT_IMAGE_CACHE_SIZE),
+              help="Maximum size of image cache, as example '512MB' or '2GB'")
+@click.option("--pack-cache-dir", type=click.Path(file_okay=False, dir_okay=True), default=None,
+              help="Directory for persistent cache of packing results (disabled by default)")
+@click.option("--io-workers", type=click.IntRange(min=1), default=None,
+              help="Workers reading images, shared by all documents (default 4 per CPU)")
+@click.option("--cpu-workers", type=click.IntRange(min=1), default=None,
+              help="Workers decoding and encoding images, shared by all documents (default 1 per CPU)")
+@click.option("--memory-limit", default=None,
+              help="Limit of decoded images held by all documents built at once, as example '8GB' "
+                   "(unlimited by default)")
+@click.option("--metrics-json", type=click.Path(dir_okay=False, file_okay=True), default=None,
+              help="Write per document metrics (stage timings, counters, peak memory) to json file")
+@click.option("--profile", is_flag=True, default=False,
+              help="Profile every document, cProfile stats (.pstats) and sampled collapsed stacks "
+                   "(.collapsed.txt, for flamegraph) are saved next to document output")
+@click.option("--force", is_flag=True, default=False,
+              help="Rebuild all selected documents, even if their inputs are unchanged since previous build")
 @click.argument("document_names", nargs=-1)
-def build(document_names: List[str], *, spec_file: str):
+def build(document_names: List[str], *, spec_file: str, executor: str, image_cache_dir: str, image_cache_size: str,
+          pack_cache_dir: str, io_workers: int, cpu_workers: int, memory_limit: str,
+          metrics_json: str, profile: bool, force: bool):
     logging.basicConfig(level=logging.INFO)
 
     spec_file = Path(spec_file)
     spec_content = spec_file.read_text()
     spec_parsed = parse_from_yaml(spec_content)
 
-    build_pipeline = BuildPipeline()
+    build_pipeline = BuildPipeline(
+        executor=executor,
+        image_cache_dir=Path(image_cache_dir) if image_cache_dir else None,
+        image_cache_size=parse_size_bytes(image_cache_size),
+        pack_cache_dir=Path(pack_cache_dir) if pack_cache_dir else None,
+        force=force,
+        io_workers=io_workers,
+        cpu_workers=cpu_workers,
+        memory_limit=parse_size_bytes(memory_limit) if memory_limit else None,
+        profile=profile,
+    )
 
     progress_bars = {}
     try:
@@ -37,10 +74,16 @@ def build(document_names: List[str], *, spec_file: str):
 
         build_pipeline.on_process_status_changed(status_changed_handler)
 
+        documents_metrics = []
+        build_pipeline.on_document_metrics(lambda doc, metrics: documents_metrics.append(metrics))
+
         if not document_names:
             build_pipeline.process_all(spec_parsed)
         else:
             build_pipeline.process_specific(spec_parsed, document_names)
+
+        if metrics_json:
+            Path(metrics_json).write_text(json.dumps({"documents": documents_metrics}, indent=2))
     finally:
         for bar in progress_bars.values():
             bar.close()
@@ -1,5 +1,6 @@
 import click
 
+from pnp_toolkit.cli.bench import bench
 from pnp_toolkit.cli.build import build
 
 
@@ -9,6 +10,7 @@ def main():
 
 
 main.add_command(build)
+main.add_command(bench)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,210 @@
+import platform
+import random
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Callable, Optional, Iterable, Dict
+
+from PIL import Image
+
+from pnp_toolkit.core.binpack.input_types import Size, Padding, SimplePaperSpec, RollPaperSpec, UnpackedItem, \
+    PaperSpec
+from pnp_toolkit.core.binpack.output_types import PackedDocument
+from pnp_toolkit.core.binpack.strategy.base import PackStrategy
+from pnp_toolkit.core.binpack.strategy.roll_guillotine import RollGuillotinePackStrategy
+from pnp_toolkit.core.binpack.strategy.simple_guillotine import SimpleGuillotinePackStrategy
+from pnp_toolkit.core.pipeline.manifest import toolkit_version
+from pnp_toolkit.core.render.pdf import PDFOutputRenderer
+from pnp_toolkit.core.render.types import RenderDocumentFlow, ImageHandle
+
+A4_PAPER = SimplePaperSpec(size=Size(210, 297), padding=Padding(5, 5, 5, 5))
+ROLL_24_INCH_PAPER = RollPaperSpec(width=609.6, padding=Padding(5, 5, 5, 5))
+
+# component sizes of epic Terraforming Mars spec (see builtin_specs/epic_tm_spec.yml)
+EPIC_TM_SIZES = [
+    (63, 88.5), (88.5, 63), (70, 70), (45, 25), (50, 30),
+    (39.96, 39.96), (106.5, 60.5), (38.52, 38.52), (129.96, 160.02),
+]
+
+DEFAULT_BENCH_REPEAT = 3
+# pixels per mm of synthetic images, about 50 dpi
+_BENCH_IMAGE_RESOLUTION = 2
+
+
+@dataclass
+class BenchDeck:
+    """
+    Synthetic deck: distinct designs (sizes of images) and count of items, items
+    cycle through designs, so most images are placed many times as in real decks.
+    """
+    name: str
+    designs: List[Size]
+    count: int
+    sheet_paper: SimplePaperSpec = field(default_factory=lambda: A4_PAPER)
+    roll_paper: RollPaperSpec = field(default_factory=lambda: ROLL_24_INCH_PAPER)
+
+    def design_of(self, item_id: int) -> int:
+        return item_id % len(self.designs)
+
+    def items(self) -> List[UnpackedItem]:
+        return [
+            UnpackedItem(idx, Size(self.designs[self.design_of(idx)].width, self.designs[self.design_of(idx)].height))
+            for idx in range(self.count)
+        ]
+
+
+@dataclass
+class BenchResult:
+    benchmark: str
+    target: str
+    deck: str
+    items: int
+    seconds: float
+    pages: int
+    paper_utilization: float
+    extra: dict = field(default_factory=dict)
+
+    @property
+    def items_per_sec(self) -> float:
+        return self.items / self.seconds if self.seconds else float("inf")
+
+    def to_json(self) -> dict:
+        return {
+            "benchmark": self.benchmark,
+            "target": self.target,
+            "deck": self.deck,
+            "items": self.items,
+            "seconds": round(self.seconds, 6),
+            "items_per_sec": round(self.items_per_sec, 1),
+            "pages": self.pages,
+            "paper_utilization": round(self.paper_utilization, 4),
+            **self.extra,
+        }
+
+
+def synthetic_decks(scale: float = 1.0, seed: int = 0) -> List[BenchDeck]:
+    """ Decks are generated from seed, so every run measures exactly the same work """
+    rng = random.Random(seed)
+
+    def count(value: int) -> int:
+        return max(1, round(value * scale))
+
+    stickers = [Size(rng.uniform(8, 20), rng.uniform(4, 12)) for _ in range(count(120))]
+
+    return [
+        BenchDeck("uniform_cards", [Size(63, 88.5)] * count(60), count=count(540)),
+        BenchDeck("mixed_sizes", [Size(*rng.choice(EPIC_TM_SIZES)) for _ in range(count(150))], count=count(1500)),
+        BenchDeck("tiny_stickers_x9", stickers, count=len(stickers) * 9),
+        BenchDeck(
+            "huge_roll",
+            [Size(rng.uniform(20, 150), rng.uniform(20, 150)) for _ in range(count(200))],
+            count=count(3000),
+        ),
+    ]
+
+
+def bench_pack(target: str, strategy: PackStrategy, paper_spec: PaperSpec, deck: BenchDeck,
+               repeat: int = DEFAULT_BENCH_REPEAT) -> BenchResult:
+    document = None
+    seconds = []
+    for _ in range(repeat):
+        items = deck.items()
+        start = time.perf_counter()
+        document = strategy.pack(paper_spec, items)
+        seconds.append(time.perf_counter() - start)
+
+    return BenchResult(
+        benchmark="pack",
+        target=target,
+        deck=deck.name,
+        items=deck.count,
+        seconds=min(seconds),
+        pages=len(document.pages),
+        paper_utilization=paper_utilization(document),
+    )
+
+
+def bench_render(deck: BenchDeck, directory: Path, repeat: int = DEFAULT_BENCH_REPEAT,
+                 max_workers: Optional[int] = None) -> BenchResult:
+    document = SimpleGuillotinePackStrategy().pack(deck.sheet_paper, deck.items())
+    front_images = _make_design_images(deck, directory)
+
+    output_path = directory / f"{deck.name}.pdf"
+    seconds = []
+    for _ in range(repeat):
+        renderer = PDFOutputRenderer(output_path, max_workers=max_workers)
+        start = time.perf_counter()
+        renderer.render(RenderDocumentFlow(pages=document.pages, front_images=front_images, back_images={}))
+        seconds.append(time.perf_counter() - start)
+
+    return BenchResult(
+        benchmark="render",
+        target="pdf",
+        deck=deck.name,
+        items=deck.count,
+        seconds=min(seconds),
+        pages=len(document.pages),
+        paper_utilization=paper_utilization(document),
+        extra={"output_bytes": output_path.stat().st_size},
+    )
+
+
+def run_benchmarks(decks: Iterable[BenchDeck], repeat: int = DEFAULT_BENCH_REPEAT, render: bool = True,
+                   progress: Optional[Callable[[BenchResult], None]] = None) -> dict:
+    pack_targets = [
+        ("simple_guillotine", SimpleGuillotinePackStrategy(rotation=False), lambda deck: deck.sheet_paper),
+        ("simple_guillotine_rotation", SimpleGuillotinePackStrategy(rotation=True), lambda deck: deck.sheet_paper),
+        ("roll_guillotine", RollGuillotinePackStrategy(), lambda deck: deck.roll_paper),
+        ("roll_guillotine_rotation", RollGuillotinePackStrategy(rotation=True), lambda deck: deck.roll_paper),
+    ]
+
+    results = []
+
+    def add_result(result: BenchResult):
+        results.append(result)
+        if progress:
+            progress(result)
+
+    with tempfile.TemporaryDirectory(prefix="pnp-toolkit-bench-") as directory:
+        for deck in decks:
+            for target, strategy, paper in pack_targets:
+                add_result(bench_pack(target, strategy, paper(deck), deck, repeat))
+            if render:
+                add_result(bench_render(deck, Path(directory), repeat))
+
+    return {
+        "version": toolkit_version(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "results": [result.to_json() for result in results],
+    }
+
+
+def paper_utilization(document: PackedDocument) -> float:
+    """ Share of paper covered by items """
+    paper_area = sum(page.size.area for page in document.pages)
+    items_area = sum(
+        width * height
+        for page in document.pages
+        for width, height in zip(page.columns.widths, page.columns.heights)
+    )
+    return items_area / paper_area if paper_area else 0.0
+
+
+def _make_design_images(deck: BenchDeck, directory: Path) -> Dict[int, ImageHandle]:
+    rng = random.Random(deck.name)
+    design_images = []
+    for design, size in enumerate(deck.designs):
+        pixel_size = (
+            max(1, round(size.width * _BENCH_IMAGE_RESOLUTION)),
+            max(1, round(size.height * _BENCH_IMAGE_RESOLUTION)),
+        )
+        # noise keeps encoders busy like real artwork, solid color would be too cheap
+        image = Image.effect_noise(pixel_size, rng.uniform(10, 80)).convert("RGB")
+        image_path = directory / f"{deck.name}_{design}.png"
+        image.save(image_path, compress_level=1)
+        design_images.append(ImageHandle(image_path))
+
+    return {idx: design_images[deck.design_of(idx)] for idx in range(deck.count)}
@@ -0,0 +1,170 @@
+import dataclasses
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Type, Optional, Iterator
+
+from pnp_toolkit.core.binpack.input_types import PaperSpec, UnpackedItem, Size
+from pnp_toolkit.core.binpack.output_types import PackedDocument, PackedPage, PackedItemColumns
+from pnp_toolkit.core.binpack.strategy.base import PackStrategy
+from pnp_toolkit.core.metrics import DocumentMetrics, count
+
+
+DEFAULT_PACK_CACHE_ENTRIES = 128
+
+_CACHE_FILE_SUFFIX = ".json"
+_CACHE_FORMAT_VERSION = 2
+_PACKED_ITEM_COLUMNS = PackedItemColumns.__slots__
+
+
+class PackCache:
+    """
+    Storage of packed documents, recently used documents are kept in memory
+    and with directory provided all documents are also persisted on disk.
+    """
+
+    def __init__(self, directory: Optional[Path] = None, max_entries: int = DEFAULT_PACK_CACHE_ENTRIES,
+                 version: Optional[str] = None):
+        self.directory = Path(directory) if directory else None
+        self.max_entries = max_entries
+        # entries made by other toolkit version never match, packer could work differently
+        self.version = version
+        self._entries = OrderedDict()  # type: OrderedDict[str, PackedDocument]
+        self._lock = threading.Lock()
+
+        if self.directory:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    def make_key(self, paper_spec: PaperSpec, strategy: PackStrategy, items: List[UnpackedItem]) -> str:
+        key_content = json.dumps({
+            "format": _CACHE_FORMAT_VERSION,
+            "version": self.version,
+            "paper": [type(paper_spec).__name__, dataclasses.asdict(paper_spec)],
+            "strategy": _describe_strategy(strategy),
+            "items": [[item.size.width, item.size.height, item.back_exists] for item in items],
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(key_content.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[PackedDocument]:
+        with self._lock:
+            document = self._entries.get(key)
+            if document is not None:
+                self._entries.move_to_end(key)
+                return document
+
+        if not self.directory:
+            return None
+
+        try:
+            document = _document_from_json(json.loads(self._entry_path(key).read_text()))
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError, TypeError) as e:
+            logging.warning(f"Ignore broken pack cache entry '{self._entry_path(key)}': {e}")
+            return None
+
+        self._remember(key, document)
+        return document
+
+    def put(self, key: str, document: PackedDocument):
+        self._remember(key, document)
+
+        if not self.directory:
+            return
+
+        # write to temporary file first, concurrent readers never see partial entry
+        entry_path = self._entry_path(key)
+        temp_path = entry_path.with_name(f"{entry_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        temp_path.write_text(json.dumps(_document_to_json(document)))
+        os.replace(temp_path, entry_path)
+
+    def _remember(self, key: str, document: PackedDocument):
+        with self._lock:
+            self._entries[key] = document
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _entry_path(self, key: str) -> Path:
+        return self.directory / f"{key}{_CACHE_FILE_SUFFIX}"
+
+
+class CachedPackStrategy(PackStrategy):
+    """
+    Packing result depends only on paper, strategy params and sizes of items (in their order),
+    but not on item ids and images. So wrapped strategy packs items identified by their
+    position in list, and cached result is remapped to ids of actual items.
+    """
+
+    def __init__(self, strategy: PackStrategy, cache: PackCache, metrics: Optional[DocumentMetrics] = None):
+        self.strategy = strategy
+        self.cache = cache
+        self.metrics = metrics
+
+    def pack(self, paper_spec: PaperSpec, items: List[UnpackedItem]) -> PackedDocument:
+        return PackedDocument(pages=list(self.pack_iter(paper_spec, items)))
+
+    def pack_iter(self, paper_spec: PaperSpec, items: List[UnpackedItem]) -> Iterator[PackedPage]:
+        slot_items = [UnpackedItem(slot, item.size, item.back_exists) for slot, item in enumerate(items)]
+        key = self.cache.make_key(paper_spec, self.strategy, slot_items)
+        item_ids = [item.id for item in items]
+
+        packed_document = self.cache.get(key)
+        count(self.metrics, "pack_cache_hits" if packed_document is not None else "pack_cache_misses")
+        if packed_document is not None:
+            for page in packed_document.pages:
+                yield _remap_page(page, item_ids)
+            return
+
+        # pages are passed further as soon as wrapped strategy yields them,
+        # document is stored only when packing is complete
+        packed_pages = []
+        for page in self.strategy.pack_iter(paper_spec, slot_items):
+            packed_pages.append(page)
+            yield _remap_page(page, item_ids)
+        self.cache.put(key, PackedDocument(pages=packed_pages))
+
+    def supported_paper(self) -> List[Type[PaperSpec]]:
+        return self.strategy.supported_paper()
+
+
+def _describe_strategy(strategy: PackStrategy) -> list:
+    params = {
+        name: _describe_strategy(value) if isinstance(value, PackStrategy) else value
+        for name, value in vars(strategy).items()
+    }
+    return [type(strategy).__module__, type(strategy).__qualname__, params]
+
+
+def _remap_page(page: PackedPage, item_ids: List[int]) -> PackedPage:
+    # cached page is shared, so result is always built from new objects
+    return PackedPage(
+        size=Size(page.size.width, page.size.height),
+        columns=page.columns.copy(ids=(item_ids[slot] for slot in page.columns.ids)),
+    )
+
+
+def _document_to_json(document: PackedDocument) -> dict:
+    return {
+        "pages": [
+            {
+                "size": [page.size.width, page.size.height],
+                "columns": {column: getattr(page.columns, column).tolist() for column in _PACKED_ITEM_COLUMNS},
+            }
+            for page in document.pages
+        ],
+    }
+
+
+def _document_from_json(content: dict) -> PackedDocument:
+    pages = []
+    for page in content["pages"]:
+        columns = PackedItemColumns()
+        for column in _PACKED_ITEM_COLUMNS:
+            getattr(columns, column).extend(page["columns"][column])
+        pages.append(PackedPage(size=Size(*page["size"]), columns=columns))
+    return PackedDocument(pages=pages)
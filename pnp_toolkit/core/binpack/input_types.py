@@ -1,15 +1,20 @@
 import abc
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Optional
 
 
 @dataclass
 class Position:
+    __slots__ = ("x", "y")
+
     x: float
     y: float
 
 
 @dataclass
 class Size:
+    __slots__ = ("width", "height")
+
     width: float
     height: float
 
@@ -33,18 +38,57 @@ class UnpackedItem:
     back_exists: bool = False
 
 
+DUPLEX_FLIPS = ["long_edge", "short_edge"]
+
+
+@dataclass(frozen=True)
+class DuplexSpec:
+    """
+    How paper is flipped by duplex printer (around long or short edge of page)
+    and printer specific offset of back side relative to front side.
+    Without flip backs are mirrored left to right whatever orientation of paper is.
+    """
+    flip: Optional[str] = None
+    offset_x: float = 0
+    offset_y: float = 0
+
+    def __post_init__(self):
+        if self.flip is not None and self.flip not in DUPLEX_FLIPS:
+            raise ValueError(f"Unsupported duplex flip '{self.flip}'. Expected one of {DUPLEX_FLIPS}")
+
+    def mirrors_left_to_right(self, portrait: bool) -> bool:
+        if self.flip is None:
+            return True
+        # long edge of portrait paper is vertical, so paper is flipped left to right
+        return (self.flip == "long_edge") == portrait
+
+
 class PaperSpec(metaclass=abc.ABCMeta):
-    pass
+    @property
+    @abc.abstractmethod
+    def portrait(self) -> bool:
+        pass
 
 
 @dataclass
 class SimplePaperSpec(PaperSpec):
     size: Size
     padding: Padding
+    duplex: DuplexSpec = field(default_factory=DuplexSpec)
+
+    @property
+    def portrait(self) -> bool:
+        return self.size.width <= self.size.height
 
 
 @dataclass
 class RollPaperSpec(PaperSpec):
     width: float
     padding: Padding
+    duplex: DuplexSpec = field(default_factory=DuplexSpec)
+
+    @property
+    def portrait(self) -> bool:
+        # roll is fed along its length, whatever length of printed content is
+        return True
 
@@ -1,5 +1,6 @@
+from array import array
 from dataclasses import dataclass
-from typing import Union, List
+from typing import Union, List, Optional, Iterable, Iterator, NamedTuple
 
 from pnp_toolkit.core.binpack.input_types import Size, Position
 
@@ -22,11 +23,137 @@ class PackedItemBack:
 
 PackedItem = Union[PackedItemFront, PackedItemBack]
 
+PACKED_ITEM_FRONT = 0
+PACKED_ITEM_BACK = 1
+
+_PACKED_ITEM_TYPES = {
+    PACKED_ITEM_FRONT: PackedItemFront,
+    PACKED_ITEM_BACK: PackedItemBack,
+}
+_PACKED_ITEM_KINDS = {item_type: kind for kind, item_type in _PACKED_ITEM_TYPES.items()}
+
+
+class PackedItemRow(NamedTuple):
+    kind: int
+    id: int
+    x: float
+    y: float
+    width: float
+    height: float
+    # 0 - not rotated, 1 - quarter turn counterclockwise, -1 - quarter turn clockwise
+    rotated: int
+
+
+class PackedItemColumns:
+    """
+    Columnar storage of packed items: parallel arrays of kind (front or back), id,
+    position, size and rotation. Strategies and renderer work with columns,
+    so no objects are allocated per packed item.
+    """
+
+    __slots__ = ("kinds", "ids", "xs", "ys", "widths", "heights", "rotated")
+
+    def __init__(self):
+        self.kinds = array("b")
+        self.ids = array("q")
+        self.xs = array("d")
+        self.ys = array("d")
+        self.widths = array("d")
+        self.heights = array("d")
+        self.rotated = array("b")
+
+    @classmethod
+    def from_items(cls, items: Iterable[PackedItem]) -> "PackedItemColumns":
+        columns = cls()
+        for item in items:
+            kind = _PACKED_ITEM_KINDS[type(item)]
+            rotated = 0
+            if item.rotated:
+                # back is seen mirrored, so it is turned to the opposite side than front
+                rotated = -1 if kind == PACKED_ITEM_BACK else 1
+            columns.append(
+                kind, item.id, item.position.x, item.position.y,
+                item.size.width, item.size.height, rotated,
+            )
+        return columns
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, PackedItemColumns):
+            return NotImplemented
+        return all(getattr(self, column) == getattr(other, column) for column in self.__slots__)
+
+    def __repr__(self) -> str:
+        return "PackedItemColumns(%r)" % list(self.rows())
+
+    def append(self, kind: int, item_id: int, x: float, y: float, width: float, height: float,
+               rotated: int = 0):
+        self.kinds.append(kind)
+        self.ids.append(item_id)
+        self.xs.append(x)
+        self.ys.append(y)
+        self.widths.append(width)
+        self.heights.append(height)
+        self.rotated.append(rotated)
+
+    def rows(self) -> Iterator[PackedItemRow]:
+        for kind, item_id, x, y, width, height, rotated in zip(
+                self.kinds, self.ids, self.xs, self.ys, self.widths, self.heights, self.rotated):
+            yield PackedItemRow(kind, item_id, x, y, width, height, rotated)
+
+    def copy(self, ids: Optional[Iterable[int]] = None) -> "PackedItemColumns":
+        """ Returns copy of columns, optionally with other item ids """
+        columns = PackedItemColumns()
+        for column in self.__slots__:
+            setattr(columns, column, array(getattr(self, column).typecode, getattr(self, column)))
+        if ids is not None:
+            columns.ids = array(self.ids.typecode, ids)
+        return columns
+
+    def translated(self, dx: float, dy: float) -> "PackedItemColumns":
+        """ Returns copy of columns with all items moved by offset """
+        columns = self.copy()
+        columns.xs = array("d", (x + dx for x in self.xs))
+        columns.ys = array("d", (y + dy for y in self.ys))
+        return columns
+
+    def to_items(self) -> List[PackedItem]:
+        return [
+            _PACKED_ITEM_TYPES[row.kind](
+                id=row.id,
+                position=Position(row.x, row.y),
+                size=Size(row.width, row.height),
+                rotated=bool(row.rotated),
+            )
+            for row in self.rows()
+        ]
+
 
-@dataclass
 class PackedPage:
-    size: Size
-    items: List[PackedItem]
+    """
+    Page of packed items. Items are stored as columns, `items` is a view API which
+    builds dataclass per item on every access, so changes of these objects are not
+    reflected by the page.
+    """
+
+    def __init__(self, size: Size, items: Optional[List[PackedItem]] = None,
+                 columns: Optional[PackedItemColumns] = None):
+        self.size = size
+        self.columns = columns if columns is not None else PackedItemColumns.from_items(items or [])
+
+    @property
+    def items(self) -> List[PackedItem]:
+        return self.columns.to_items()
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, PackedPage):
+            return NotImplemented
+        return self.size == other.size and self.columns == other.columns
+
+    def __repr__(self) -> str:
+        return "PackedPage(size=%r, items=%r)" % (self.size, self.items)
 
 
 @dataclass
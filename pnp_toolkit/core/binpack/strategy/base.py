@@ -1,8 +1,8 @@
 import abc
-from typing import List, Type
+from typing import List, Type, Iterator
 
 from pnp_toolkit.core.binpack.input_types import PaperSpec, UnpackedItem
-from pnp_toolkit.core.binpack.output_types import PackedDocument
+from pnp_toolkit.core.binpack.output_types import PackedDocument, PackedPage
 
 
 class PackStrategy(metaclass=abc.ABCMeta):
@@ -10,6 +10,13 @@ class PackStrategy(metaclass=abc.ABCMeta):
     def pack(self, paper_spec: PaperSpec, components: List[UnpackedItem]) -> PackedDocument:
         pass
 
+    def pack_iter(self, paper_spec: PaperSpec, components: List[UnpackedItem]) -> Iterator[PackedPage]:
+        """
+        Yields packed pages in document order. Strategies able to finish pages
+        before all components are packed override it, so rendering starts earlier.
+        """
+        yield from self.pack(paper_spec, components).pages
+
     @abc.abstractmethod
     def supported_paper(self) -> List[Type[PaperSpec]]:
         pass
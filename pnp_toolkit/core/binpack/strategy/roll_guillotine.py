@@ -1,15 +1,21 @@
 import sys
-from collections import namedtuple
-from copy import deepcopy
-from typing import List, Type
+from collections import namedtuple, deque
+from typing import List, Type, Dict, Deque, Tuple, Optional
 
-from pnp_toolkit.core.binpack.input_types import RollPaperSpec, UnpackedItem, Size, PaperSpec, Position
-from pnp_toolkit.core.binpack.output_types import PackedDocument, PackedPage, PackedItem, PackedItemFront
+from sortedcontainers import SortedList
+
+from pnp_toolkit.core.binpack.input_types import RollPaperSpec, UnpackedItem, Size, PaperSpec
+from pnp_toolkit.core.binpack.output_types import PackedDocument, PackedPage, PackedItemColumns, PACKED_ITEM_FRONT
 from pnp_toolkit.core.binpack.strategy.base import PackStrategy
 from pnp_toolkit.core.binpack.utils import generate_back_page
 
 
 class RollGuillotinePackStrategy(PackStrategy):
+    def __init__(self, rotation: bool = False, sorting: str = "width"):
+        _sorting_dimension(sorting)
+        self.rotation = rotation
+        self.sorting = sorting
+
     def pack(self, paper_spec: RollPaperSpec, items: List[UnpackedItem]) -> PackedDocument:
 
         work_width = paper_spec.width - paper_spec.padding.left - paper_spec.padding.right
@@ -21,32 +27,31 @@ class RollGuillotinePackStrategy(PackStrategy):
             boxes.append(box)
             box_id_to_item_id[idx] = item.id
 
-        height, rectangles = phsppog(work_width, boxes)
+        if self.rotation:
+            height, rectangles = phspprg(work_width, boxes, sorting=self.sorting)
+        else:
+            height, rectangles = phsppog(work_width, boxes, sorting=self.sorting)
 
         result_width = paper_spec.width
         result_height = height + paper_spec.padding.top + paper_spec.padding.bottom
 
         result_page_size = Size(result_width, result_height)
 
-        packed_items = []
+        packed_items = PackedItemColumns()
 
         for idx, rect in enumerate(rectangles):
             item_id = box_id_to_item_id[idx]
             pos_x = rect.x + paper_spec.padding.left
             pos_y = rect.y + paper_spec.padding.top
-            front_item = PackedItemFront(
-                id=item_id,
-                position=Position(pos_x, pos_y),
-                size=Size(rect.w, rect.h),
-            )
-            packed_items.append(front_item)
-
-        packed_page = PackedPage(size=result_page_size, items=packed_items)
+            rotated = (rect.w, rect.h) != boxes[idx]
+            packed_items.append(PACKED_ITEM_FRONT, item_id, pos_x, pos_y, rect.w, rect.h, rotated)
+
+        packed_page = PackedPage(size=result_page_size, columns=packed_items)
         packed_pages = [packed_page]
 
         items_with_backs = {i.id for i in items if i.back_exists}
-        back_page = generate_back_page(packed_page, items_with_backs)
-        if len(back_page.items) != 0:
+        back_page = generate_back_page(packed_page, items_with_backs, paper_spec.duplex, paper_spec.portrait)
+        if len(back_page.columns) != 0:
             packed_pages.append(back_page)
 
         return PackedDocument(packed_pages)
@@ -80,26 +85,17 @@ def phspprg(width, rectangles, sorting="width"):
         A list of rectangles, in the same order as the input list. This contains bottom left x and y coordinate and
         the width and height (which can be flipped compared to input).
     """
-    if sorting not in ["width", "height" ]:
-        raise ValueError("The algorithm only supports sorting by width or height but {} was given.".format(sorting))
-    if sorting == "width":
-        wh = 0
-    else:
-        wh = 1
+    wh = _sorting_dimension(sorting)
 
     result = [None] * len(rectangles)
-    remaining = deepcopy(rectangles)
-    for idx, r in enumerate(remaining):
-        if r[0] > r[1]:
-            remaining[idx][0], remaining[idx][1] = remaining[idx][1], remaining[idx][0]
+    remaining = [(r[0], r[1]) if r[0] <= r[1] else (r[1], r[0]) for r in rectangles]
 
     sorted_indices = sorted(range(len(remaining)), key=lambda x: -remaining[x][wh])
-
-    sorted_rect = [remaining[idx] for idx in sorted_indices]
+    candidates = _RemainingRectangles(remaining, sorted_indices)
 
     x, y, w, h, H = 0, 0, 0, 0, 0
-    while sorted_indices:
-        idx = sorted_indices.pop(0)
+    while candidates:
+        idx = candidates.pop_first()
         r = remaining[idx]
         if r[1] > width:
             result[idx] = Rectangle(x, y, r[0], r[1])
@@ -107,9 +103,9 @@ def phspprg(width, rectangles, sorting="width"):
         else:
             result[idx] = Rectangle(x, y, r[1], r[0])
             x, y, w, h, H = r[1], H, width - r[1], r[0], H + r[0]
-        recursive_packing(x, y, w, h, 1, remaining, sorted_indices, result)
+        pack_area(x, y, w, h, 1, remaining, candidates, result)
         x, y = 0, H
-    
+
     return H, result
 
 
@@ -135,76 +131,270 @@ def phsppog(width, rectangles, sorting="width"):
         A list of rectangles, in the same order as the input list. This contains bottom left x and y coordinate and
         the width and height (which can be flipped compared to input).
     """
-    if sorting not in ["width", "height" ]:
-        raise ValueError("The algorithm only supports sorting by width or height but {} was given.".format(sorting))
-    if sorting == "width":
-        wh = 0
-    else:
-        wh = 1
-    
+    wh = _sorting_dimension(sorting)
+
     result = [None] * len(rectangles)
-    remaining = deepcopy(rectangles)
-    
+    remaining = rectangles
+
     sorted_indices = sorted(range(len(remaining)), key=lambda x: -remaining[x][wh])
-    
-    sorted_rect = [remaining[idx] for idx in sorted_indices]
-    
+    candidates = _RemainingRectangles(remaining, sorted_indices)
+
     x, y, w, h, H = 0, 0, 0, 0, 0
-    while sorted_indices:
-        idx = sorted_indices.pop(0)
+    while candidates:
+        idx = candidates.pop_first()
         r = remaining[idx]
         result[idx] = Rectangle(x, y, r[0], r[1])
         x, y, w, h, H = r[0], H, width - r[0], r[1], H + r[1]
-        recursive_packing(x, y, w, h, 0, remaining, sorted_indices, result)
+        pack_area(x, y, w, h, 0, remaining, candidates, result)
         x, y = 0, H
-    
 
     return H, result
 
 
-def recursive_packing(x, y, w, h, D, remaining, indices, result):
-    """Helper function to recursively fit a certain area."""
-    priority = 6
-    for idx in indices:
+def _sorting_dimension(sorting: str) -> int:
+    if sorting not in ["width", "height" ]:
+        raise ValueError("The algorithm only supports sorting by width or height but {} was given.".format(sorting))
+    if sorting == "width":
+        return 0
+    return 1
+
+
+class _RemainingRectangles:
+    """
+    Not yet placed rectangles grouped by size. Every group keeps its rectangles in placement order,
+    so the first rectangle of group is always the best candidate among rectangles of same size.
+
+    Groups are indexed by width and by height, so exact fit and same width/height candidates are
+    found by lookup, and smaller candidates are found by _MinSidesTree over placement order.
+    """
+
+    def __init__(self, rectangles, sorted_indices: List[int]):
+        self._rectangles = rectangles
+        self._sorted_indices = sorted_indices
+        self._cursor = 0
+        self._placed = [False] * len(rectangles)
+        self._count = len(sorted_indices)
+        self._orders = [0] * len(rectangles)
+        # size -> deque of (order position, rectangle index)
+        self._groups = {}  # type: Dict[Tuple[float, float], Deque[Tuple[int, int]]]
+        # width -> heights of groups with such width, and vice versa
+        self._heights_by_width = {}  # type: Dict[float, SortedList]
+        self._widths_by_height = {}  # type: Dict[float, SortedList]
+        for order, idx in enumerate(sorted_indices):
+            self._orders[idx] = order
+            size = (rectangles[idx][0], rectangles[idx][1])
+            group = self._groups.get(size)
+            if group is None:
+                group = self._groups[size] = deque()
+                self._heights_by_width.setdefault(size[0], SortedList()).add(size[1])
+                self._widths_by_height.setdefault(size[1], SortedList()).add(size[0])
+            group.append((order, idx))
+        self._tree = _MinSidesTree([rectangles[idx] for idx in sorted_indices])
+
+    def __bool__(self) -> bool:
+        return self._count > 0
+
+    def pop_first(self) -> int:
+        """Removes and returns first not placed rectangle in sorted order"""
+        while self._placed[self._sorted_indices[self._cursor]]:
+            self._cursor += 1
+        return self._remove_first_of_group(self._sorted_indices[self._cursor])
+
+    def find_best(self, w, h, D):
+        """
+        Returns (priority, orientation, index) of first rectangle in sorted order with the best priority
+        for area w*h, where priority is 1 - exact fit, 2 - same width, 3 - same height, 4 - smaller,
+        5 - doesn't fit. Orientation is first one (0 - as is, 1 - rotated) with the best priority.
+        """
+        if not self._groups:
+            return 6, None, None
+
+        best_priority, best_order, best_orientation, best_idx = 5, None, 0, None
         for j in range(0, D + 1):
-            if priority > 1 and remaining[idx][(0 + j) % 2] == w and remaining[idx][(1 + j) % 2] == h:
-                priority, orientation, best = 1, j, idx
+            priority, first = self._find_best_oriented(w, h, j)
+            if first is None:
+                continue
+            order, idx = first
+            if priority < best_priority or (priority == best_priority and order < best_order):
+                best_priority, best_order, best_orientation, best_idx = priority, order, j, idx
+
+        return best_priority, best_orientation, best_idx
+
+    def remove(self, idx: int):
+        """Removes rectangle, only rectangles returned by find_best could be removed"""
+        self._remove_first_of_group(idx)
+
+    def min_sides(self) -> Tuple[float, float]:
+        return self._tree.min_sides()
+
+    def _find_best_oriented(self, w, h, j) -> Tuple[int, Optional[Tuple[int, int]]]:
+        """
+        Best priority and first (order, index) of it for rectangles placed with orientation j,
+        rectangle of size (rw, rh) covers (rw, rh) as is and (rh, rw) rotated.
+        """
+        exact_group = self._groups.get((w, h) if j == 0 else (h, w))
+        if exact_group:
+            return 1, exact_group[0]
+
+        if j == 0:
+            same_width = self._first_of_groups(self._heights_by_width.get(w), h, lambda rh: (w, rh))
+            same_height = self._first_of_groups(self._widths_by_height.get(h), w, lambda rw: (rw, h))
+        else:
+            same_width = self._first_of_groups(self._widths_by_height.get(w), h, lambda rw: (rw, w))
+            same_height = self._first_of_groups(self._heights_by_width.get(h), w, lambda rh: (h, rh))
+        if same_width is not None:
+            return 2, same_width
+        if same_height is not None:
+            return 3, same_height
+
+        order = self._tree.find_first(w, h, rotated=j == 1)
+        if order is not None:
+            return 4, (order, self._sorted_indices[order])
+        return 5, None
+
+    def _first_of_groups(self, sides: Optional[SortedList], max_side, group_size) -> Optional[Tuple[int, int]]:
+        """First (order, index) among groups with other side strictly less than max_side"""
+        if not sides or sides[0] >= max_side:
+            return None
+        first = None
+        for side in sides.irange(maximum=max_side, inclusive=(True, False)):
+            group_first = self._groups[group_size(side)][0]
+            if first is None or group_first < first:
+                first = group_first
+        return first
+
+    def _remove_first_of_group(self, idx: int) -> int:
+        size = (self._rectangles[idx][0], self._rectangles[idx][1])
+        group = self._groups[size]
+        group.popleft()
+        if not group:
+            del self._groups[size]
+            self._remove_side(self._heights_by_width, size[0], size[1])
+            self._remove_side(self._widths_by_height, size[1], size[0])
+
+        self._tree.remove(self._orders[idx])
+        self._placed[idx] = True
+        self._count -= 1
+        return idx
+
+    @staticmethod
+    def _remove_side(sides_index: Dict[float, SortedList], key, side):
+        sides = sides_index[key]
+        sides.remove(side)
+        if not sides:
+            del sides_index[key]
+
+
+class _MinSidesTree:
+    """
+    Segment tree over rectangles in placement order, every node keeps minimal width and height
+    of not placed rectangles below it. Whole subtrees without small enough rectangles are skipped,
+    so first rectangle smaller than area is found without scanning all remaining ones.
+    """
+
+    _EMPTY = sys.maxsize
+
+    def __init__(self, sizes):
+        leaves = 1
+        while leaves < len(sizes):
+            leaves *= 2
+        self._leaves = leaves
+        self._min_w = [self._EMPTY] * (2 * leaves)
+        self._min_h = [self._EMPTY] * (2 * leaves)
+        for position, size in enumerate(sizes):
+            self._min_w[leaves + position] = size[0]
+            self._min_h[leaves + position] = size[1]
+        for node in range(leaves - 1, 0, -1):
+            self._update_node(node)
+
+    def min_sides(self) -> Tuple[float, float]:
+        return self._min_w[1], self._min_h[1]
+
+    def find_first(self, w, h, rotated: bool = False) -> Optional[int]:
+        """
+        Position of first rectangle with width < w and height < h,
+        or with height < w and width < h if rotated.
+        """
+        min_w, min_h = (self._min_h, self._min_w) if rotated else (self._min_w, self._min_h)
+        nodes = [1]
+        while nodes:
+            node = nodes.pop()
+            if min_w[node] >= w or min_h[node] >= h:
+                continue
+            if node >= self._leaves:
+                return node - self._leaves
+            # right child pushed first, so left one is checked first
+            nodes.append(2 * node + 1)
+            nodes.append(2 * node)
+        return None
+
+    def remove(self, position: int):
+        min_w, min_h = self._min_w, self._min_h
+        node = self._leaves + position
+        min_w[node] = min_h[node] = self._EMPTY
+        node //= 2
+        while node:
+            left, right = 2 * node, 2 * node + 1
+            node_w = min_w[left] if min_w[left] < min_w[right] else min_w[right]
+            node_h = min_h[left] if min_h[left] < min_h[right] else min_h[right]
+            # same sized sibling keeps all minimums above unchanged, typical for decks of equal cards
+            if node_w == min_w[node] and node_h == min_h[node]:
                 break
-            elif priority > 2 and remaining[idx][(0 + j) % 2] == w and remaining[idx][(1 + j) % 2] < h:
-                priority, orientation, best = 2, j, idx
-            elif priority > 3 and remaining[idx][(0 + j) % 2] < w and remaining[idx][(1 + j) % 2] == h:
-                priority, orientation, best = 3, j, idx
-            elif priority > 4 and remaining[idx][(0 + j) % 2] < w and remaining[idx][(1 + j) % 2] < h:
-                priority, orientation, best = 4, j, idx
-            elif priority > 5:
-                priority, orientation, best = 5, j, idx
-    if priority < 5:
+            min_w[node], min_h[node] = node_w, node_h
+            node //= 2
+
+    def _update_node(self, node: int):
+        self._min_w[node] = min(self._min_w[2 * node], self._min_w[2 * node + 1])
+        self._min_h[node] = min(self._min_h[2 * node], self._min_h[2 * node + 1])
+
+
+def pack_area(x, y, w, h, D, remaining, candidates: _RemainingRectangles, result):
+    """
+    Helper function to fit a certain area. Sub-areas are processed depth first
+    with explicit stack in the same order as recursive definition of heuristic does.
+    """
+    areas = [(x, y, w, h)]
+    while areas:
+        x, y, w, h = areas.pop()
+
+        priority, orientation, best = candidates.find_best(w, h, D)
+        if priority >= 5:
+            continue
+
         if orientation == 0:
             omega, d = remaining[best][0], remaining[best][1]
         else:
             omega, d = remaining[best][1], remaining[best][0]
         result[best] = Rectangle(x, y, omega, d)
-        indices.remove(best)
+        candidates.remove(best)
+
+        # sub-areas pushed in reverse order, so first one is processed first
         if priority == 2:
-            recursive_packing(x, y + d, w, h - d, D, remaining, indices, result)
+            areas.append((x, y + d, w, h - d))
         elif priority == 3:
-            recursive_packing(x + omega, y, w - omega, h, D, remaining, indices, result)
+            areas.append((x + omega, y, w - omega, h))
         elif priority == 4:
-            min_w = sys.maxsize
-            min_h = sys.maxsize
-            for idx in indices:
-                min_w = min(min_w, remaining[idx][0])
-                min_h = min(min_h, remaining[idx][1])
+            min_w, min_h = candidates.min_sides()
             # Because we can rotate:
             min_w = min(min_h, min_w)
             min_h = min_w
             if w - omega < min_w:
-                recursive_packing(x, y + d, w, h - d, D, remaining, indices, result)
+                areas.append((x, y + d, w, h - d))
             elif h - d < min_h:
-                recursive_packing(x + omega, y, w - omega, h, D, remaining, indices, result)
+                areas.append((x + omega, y, w - omega, h))
             elif omega < min_w:
-                recursive_packing(x + omega, y, w - omega, d, D, remaining, indices, result)
-                recursive_packing(x, y + d, w, h - d, D, remaining, indices, result)
+                areas.append((x, y + d, w, h - d))
+                areas.append((x + omega, y, w - omega, d))
             else:
-                recursive_packing(x, y + d, omega, h - d, D, remaining, indices, result)
-                recursive_packing(x + omega, y, w - omega, h, D, remaining, indices, result)
\ No newline at end of file
+                areas.append((x + omega, y, w - omega, h))
+                areas.append((x, y + d, omega, h - d))
+
+
+def recursive_packing(x, y, w, h, D, remaining, indices, result):
+    """
+    Former recursive helper, kept for compatibility, use pack_area instead.
+    Placed rectangles are removed from indices, as before.
+    """
+    candidates = _RemainingRectangles(remaining, list(indices))
+    pack_area(x, y, w, h, D, remaining, candidates, result)
+    indices[:] = [idx for idx in indices if result[idx] is None]
@@ -0,0 +1,113 @@
+import multiprocessing
+import time
+from multiprocessing.pool import AsyncResult
+from typing import List, Type, Optional
+
+from pnp_toolkit.core.binpack.input_types import PaperSpec, SimplePaperSpec, RollPaperSpec, UnpackedItem
+from pnp_toolkit.core.binpack.output_types import PackedDocument, PackedPage, PACKED_ITEM_FRONT
+from pnp_toolkit.core.binpack.strategy.base import PackStrategy
+from pnp_toolkit.core.binpack.strategy.roll_guillotine import RollGuillotinePackStrategy
+from pnp_toolkit.core.binpack.strategy.simple_guillotine import SimpleGuillotinePackStrategy, ITEM_SORTINGS, \
+    SPLIT_HEURISTICS
+
+DEFAULT_SEARCH_TIME_BUDGET = 10.0  # seconds
+RESULT_POLL_INTERVAL = 0.05  # seconds
+ROLL_SORTINGS = ["width", "height"]
+
+
+class SearchPackStrategy(PackStrategy):
+    """
+    Packs items with portfolio of strategy configurations (sort order x split heuristic x rotation)
+    in worker processes and keeps the layout with the least paper usage: the fewest front
+    sheets for sheet paper and the shortest roll for roll paper (back pages follow fronts,
+    so they aren't counted). Ties are resolved in favor of earlier configuration, the first
+    one is always the default configuration of strategy.
+
+    Configurations not finished within time budget are dropped, but at least one layout
+    is always waited for. Worker processes are terminated as soon as the layout is chosen,
+    so no configuration keeps running after pack returns.
+    """
+
+    def __init__(self, rotation: bool = True, time_budget: Optional[float] = DEFAULT_SEARCH_TIME_BUDGET,
+                 max_workers: Optional[int] = None):
+        if not max_workers:
+            max_workers = multiprocessing.cpu_count()
+        self.rotation = rotation
+        self.time_budget = time_budget
+        self.max_workers = max_workers
+
+    def pack(self, paper_spec: PaperSpec, items: List[UnpackedItem]) -> PackedDocument:
+        candidates = self.candidate_strategies(paper_spec)
+
+        pool = multiprocessing.Pool(processes=min(self.max_workers, len(candidates)))
+        try:
+            results = [pool.apply_async(_pack_candidate, (candidate, paper_spec, items)) for candidate in candidates]
+            _wait_all(results, self.time_budget)
+
+            # nothing succeeded within time budget, so wait for the first successful layout
+            while not any(_is_succeeded(result) for result in results) \
+                    and not all(result.ready() for result in results):
+                time.sleep(RESULT_POLL_INTERVAL)
+        finally:
+            # configurations still running are interrupted, their layouts aren't needed anymore
+            pool.terminate()
+            pool.join()
+
+        succeeded = [result for result in results if _is_succeeded(result)]
+        if not succeeded:
+            # all configurations failed, same error expected from each of them
+            return results[0].get()
+
+        return min((result.get() for result in succeeded), key=_paper_usage)
+
+    def candidate_strategies(self, paper_spec: PaperSpec) -> List[PackStrategy]:
+        rotations = [True, False] if self.rotation else [False]
+
+        if isinstance(paper_spec, SimplePaperSpec):
+            return [
+                SimpleGuillotinePackStrategy(rotation=rotation, sorting=sorting, split_heuristic=split_heuristic)
+                for sorting in ITEM_SORTINGS
+                for split_heuristic in SPLIT_HEURISTICS
+                for rotation in rotations
+            ]
+
+        if isinstance(paper_spec, RollPaperSpec):
+            return [
+                RollGuillotinePackStrategy(rotation=rotation, sorting=sorting)
+                for sorting in ROLL_SORTINGS
+                for rotation in reversed(rotations)
+            ]
+
+        raise ValueError(f"Unsupported paper type {type(paper_spec)}")
+
+    def supported_paper(self) -> List[Type[PaperSpec]]:
+        return [SimplePaperSpec, RollPaperSpec]
+
+
+def _pack_candidate(strategy: PackStrategy, paper_spec: PaperSpec, items: List[UnpackedItem]) -> PackedDocument:
+    return strategy.pack(paper_spec, items)
+
+
+def _wait_all(results: List[AsyncResult], timeout: Optional[float]):
+    deadline = None if timeout is None else time.monotonic() + timeout
+    for result in results:
+        if deadline is None:
+            result.wait()
+            continue
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        result.wait(remaining)
+
+
+def _is_succeeded(result: AsyncResult) -> bool:
+    return result.ready() and result.successful()
+
+
+def _paper_usage(document: PackedDocument) -> float:
+    return sum(page.size.area for page in document.pages if _is_front_page(page))
+
+
+def _is_front_page(page: PackedPage) -> bool:
+    return PACKED_ITEM_FRONT in page.columns.kinds
@@ -1,15 +1,37 @@
-from typing import List, Type
+import math
+from typing import List, Type, Iterator
 
 import typing
 
-from sortedcontainers import SortedListWithKey
+from sortedcontainers import SortedList, SortedListWithKey
 
-from pnp_toolkit.core.binpack.input_types import UnpackedItem, PaperSpec, SimplePaperSpec, Size, Position
-from pnp_toolkit.core.binpack.output_types import PackedDocument, PackedItem, PackedItemFront, PackedPage
+from pnp_toolkit.core.binpack.input_types import UnpackedItem, PaperSpec, SimplePaperSpec, Size
+from pnp_toolkit.core.binpack.output_types import PackedDocument, PackedItem, PackedPage, PackedItemColumns, \
+    PACKED_ITEM_FRONT
 from pnp_toolkit.core.binpack.strategy.base import PackStrategy
 from pnp_toolkit.core.binpack.utils import generate_back_page
 
 
+# keys of items sorting, items are packed in descending order of key
+ITEM_SORTINGS = {
+    "area": lambda item: item.size.width * item.size.height,
+    "perimeter": lambda item: item.size.width + item.size.height,
+    "longest_side": lambda item: max(item.size.width, item.size.height),
+    "width": lambda item: item.size.width,
+    "height": lambda item: item.size.height,
+}
+
+SPLIT_HEURISTICS = [
+    "default",
+    "SplitShorterLeftoverAxis",
+    "SplitLongerLeftoverAxis",
+    "SplitMinimizeArea",
+    "SplitMaximizeArea",
+    "SplitShorterAxis",
+    "SplitLongerAxis",
+]
+
+
 class FreeRectangle(
     typing.NamedTuple('FreeRectangle', [('width', float), ('height', float), ('x', float), ('y', float)])
 ):
@@ -20,6 +42,10 @@ class FreeRectangle(
         return self.width * self.height
 
 
+# edge key to free rectangles lying on that edge
+_EdgeIndex = typing.Dict[typing.Tuple[float, float, float], typing.List[FreeRectangle]]
+
+
 class GuillotineBin:
     def __init__(self,
                  size: Size,
@@ -34,13 +60,19 @@ class GuillotineBin:
 
         self._score = self.scoreBAF
 
-        if self.size.width == 0 or self.size.height == 0:
-            # self.freerects = [] # type: List[FreeRectangle]
-            self.freerects = SortedListWithKey(iterable=None, key=lambda x: x.area)
-        else:
-            self.freerects = SortedListWithKey([FreeRectangle(self.size.width, self.size.height, 0, 0)],
-                                               key=lambda x: x.area)
-        self.items = []  # type: List[PackedItem]
+        self.freerects = SortedListWithKey(iterable=None, key=lambda x: x.area)
+        # free rectangles indexed by each edge (edge position, edge length and edge offset),
+        # used by rectangle merge to find adjacent rectangles without full scan. Several rectangles
+        # could share an edge (as example degenerate ones left by float residue), so lists are kept
+        self._freerects_by_bottom = {}  # type: _EdgeIndex
+        self._freerects_by_top = {}  # type: _EdgeIndex
+        self._freerects_by_left = {}  # type: _EdgeIndex
+        self._freerects_by_right = {}  # type: _EdgeIndex
+        # the largest width and height among free rectangles, computed on demand
+        self._max_free_sides = None  # type: typing.Optional[typing.Tuple[float, float]]
+        if self.size.width != 0 and self.size.height != 0:
+            self._add_freerect(FreeRectangle(self.size.width, self.size.height, 0, 0))
+        self.columns = PackedItemColumns()
         self.rotation = rotation
 
     @staticmethod
@@ -51,6 +83,34 @@ class GuillotineBin:
     def __repr__(self) -> str:
         return "Guillotine(%r)" % self.items
 
+    @property
+    def items(self) -> List[PackedItem]:
+        return self.columns.to_items()
+
+    @property
+    def max_free_area(self) -> float:
+        """ Area of the largest free rectangle, no item with bigger area fits the bin """
+        if not self.freerects:
+            return 0
+        return self.freerects[-1].area
+
+    def could_fit(self, item: UnpackedItem) -> bool:
+        """
+        Cheap check by the largest free rectangle area and the largest free sides.
+        False means that item doesn't fit the bin for sure.
+        """
+        if not self.freerects or item.size.area > self.max_free_area:
+            return False
+        if self._max_free_sides is None:
+            self._max_free_sides = (
+                max(rect.width for rect in self.freerects),
+                max(rect.height for rect in self.freerects),
+            )
+        max_width, max_height = self._max_free_sides
+        if item.size.width <= max_width and item.size.height <= max_height:
+            return True
+        return self.rotation and item.size.height <= max_width and item.size.width <= max_height
+
     @staticmethod
     def _item_fits_rect(item: UnpackedItem,
                         rect: FreeRectangle,
@@ -132,69 +192,103 @@ class GuillotineBin:
 
     def _add_item(self, item: UnpackedItem, x: int, y: int, rotate: bool = False) -> None:
         """ Helper method for adding items to the bin """
-        size = item.size
+        width, height = item.size.width, item.size.height
         if rotate:
-            size = Size(size.height, size.width)
+            width, height = height, width
+
+        self.columns.append(PACKED_ITEM_FRONT, item.id, x, y, width, height, rotate)
+        self.free_area -= width * height
+
+    def _add_freerect(self, rect: FreeRectangle) -> None:
+        self._max_free_sides = None
+        self.freerects.add(rect)
+        _index_edge(self._freerects_by_bottom, (rect.y, rect.x, rect.width), rect)
+        _index_edge(self._freerects_by_top, (rect.y + rect.height, rect.x, rect.width), rect)
+        _index_edge(self._freerects_by_left, (rect.x, rect.y, rect.height), rect)
+        _index_edge(self._freerects_by_right, (rect.x + rect.width, rect.y, rect.height), rect)
+
+    def _remove_freerect(self, rect: FreeRectangle) -> None:
+        self._max_free_sides = None
+        self.freerects.remove(rect)
+        _unindex_edge(self._freerects_by_bottom, (rect.y, rect.x, rect.width), rect)
+        _unindex_edge(self._freerects_by_top, (rect.y + rect.height, rect.x, rect.width), rect)
+        _unindex_edge(self._freerects_by_left, (rect.x, rect.y, rect.height), rect)
+        _unindex_edge(self._freerects_by_right, (rect.x + rect.width, rect.y, rect.height), rect)
+
+    def _contains_freerect(self, rect: FreeRectangle) -> bool:
+        return rect in self._freerects_by_bottom.get((rect.y, rect.x, rect.width), ())
+
+    def _merge_with_adjacent(self, rect: FreeRectangle) -> typing.Optional[FreeRectangle]:
+        """
+        Merges rectangle with first adjacent one sharing full edge.
+        Returns merged rectangle or None if there is nothing to merge with.
+        """
+        # degenerate rectangle shares key of its opposite edges, so it never merges with itself
+        above = _other_on_edge(self._freerects_by_bottom, (rect.y + rect.height, rect.x, rect.width), rect)
+        below = _other_on_edge(self._freerects_by_top, (rect.y, rect.x, rect.width), rect)
+        right = _other_on_edge(self._freerects_by_left, (rect.x + rect.width, rect.y, rect.height), rect)
+        left = _other_on_edge(self._freerects_by_right, (rect.x, rect.y, rect.height), rect)
+
+        if above:
+            match_rect = above
+            merged_rect = FreeRectangle(rect.width, rect.height + above.height, rect.x, rect.y)
+        elif below:
+            match_rect = below
+            merged_rect = FreeRectangle(rect.width, below.height + rect.height, below.x, below.y)
+        elif right:
+            match_rect = right
+            merged_rect = FreeRectangle(rect.width + right.width, rect.height, rect.x, rect.y)
+        elif left:
+            match_rect = left
+            merged_rect = FreeRectangle(left.width + rect.width, rect.height, left.x, left.y)
+        else:
+            return None
 
-        packed_item = PackedItemFront(
-            id=item.id,
-            position=Position(x, y),
-            size=size,
-            rotated=rotate,
-        )
-        self.items.append(packed_item)
-        self.free_area -= size.area
+        self._remove_freerect(rect)
+        self._remove_freerect(match_rect)
+        self._add_freerect(merged_rect)
+        return merged_rect
 
-    def rectangle_merge(self) -> None:
+    def rectangle_merge(self, rects: typing.Optional[typing.Iterable[FreeRectangle]] = None) -> None:
         """
         Rectangle Merge optimization
-        Finds pairs of free rectangles and merges them if they are mergable.
+        Merges provided free rectangles (all by default) with adjacent free rectangles
+        while it possible. Adjacent rectangles found by edge index lookup, so work is
+        proportional to count of merged rectangles, not to count of all free rectangles.
         """
-        for freerect in self.freerects:
-            widths_func = lambda r: (r.width == freerect.width and
-                                     r.x == freerect.x and r != freerect)
-            matching_widths = list(filter(widths_func, self.freerects))
-            heights_func = lambda r: (r.height == freerect.height and
-                                      r.y == freerect.y and r != freerect)
-            matching_heights = list(filter(heights_func, self.freerects))
-            if matching_widths:
-                widths_adjacent = list(
-                    filter(lambda r: r.y == freerect.y + freerect.height, matching_widths))  # type: List[FreeRectangle]
-
-                if widths_adjacent:
-                    match_rect = widths_adjacent[0]
-                    merged_rect = FreeRectangle(freerect.width,
-                                                freerect.height + match_rect.height,
-                                                freerect.x,
-                                                freerect.y)
-                    self.freerects.remove(freerect)
-                    self.freerects.remove(match_rect)
-                    self.freerects.add(merged_rect)
-
-            if matching_heights:
-                heights_adjacent = list(filter(lambda r: r.x == freerect.x + freerect.width, matching_heights))
-                if heights_adjacent:
-                    match_rect = heights_adjacent[0]
-                    merged_rect = FreeRectangle(freerect.width + match_rect.width,
-                                                freerect.height,
-                                                freerect.x,
-                                                freerect.y)
-                    self.freerects.remove(freerect)
-                    self.freerects.remove(match_rect)
-                    self.freerects.add(merged_rect)
+        pending = list(self.freerects if rects is None else rects)
+        while pending:
+            rect = pending.pop()
+            if not self._contains_freerect(rect):
+                continue
+
+            merged_rect = self._merge_with_adjacent(rect)
+            if merged_rect:
+                pending.append(merged_rect)
 
     def _find_best_score(self, item: UnpackedItem):
-        rects = []
-        for rect in self.freerects:
+        """
+        Free rectangles are ordered by area, so for best area fit score only rectangles
+        not smaller than item are checked, and scan stops right after the last rectangle
+        which still could have the best score (first score component grows with area).
+        """
+        best = None
+        item_area = item.size.area
+        for rect in self.freerects.irange_key(min_key=item_area):
+            if best is not None and rect.area - item_area > best[0][0]:
+                break
             if self._item_fits_rect(item, rect):
-                rects.append((self._score(rect, item), rect, False))
+                score = self._score(rect, item)
+                if best is None or score < best[0]:
+                    best = (score, rect, False)
             if self.rotation and self._item_fits_rect(item, rect, rotation=True):
-                rects.append((self._score(rect, item), rect, True))
-        try:
-            _score, rect, rot = min(rects, key=lambda x: x[0])
-            return _score, rect, rot
-        except ValueError:
+                score = self._score(rect, item)
+                if best is None or score < best[0]:
+                    best = (score, rect, True)
+
+        if best is None:
             return None, None, False
+        return best
 
     def insert(self, item: UnpackedItem) -> bool:
         """
@@ -203,15 +297,34 @@ class GuillotineBin:
         _, best_rect, rotated = self._find_best_score(item)
         if best_rect:
             self._add_item(item, best_rect.x, best_rect.y, rotated)
-            self.freerects.remove(best_rect)
+            self._remove_freerect(best_rect)
+            if rotated:
+                # free space is split around item as it is placed
+                item = UnpackedItem(item.id, Size(item.size.height, item.size.width), item.back_exists)
             splits = self._split_free_rect(item, best_rect)
             for rect in splits:
-                self.freerects.add(rect)
+                self._add_freerect(rect)
             if self.rMerge:
-                self.rectangle_merge()
+                self.rectangle_merge(splits)
             return True
         return False
 
+    def clone_layout(self, items: List[UnpackedItem]) -> "GuillotineBin":
+        """
+        Returns new bin with the same free rectangles and item placements,
+        occupied by provided items (same sizes and order as items of this bin).
+        """
+        clone = GuillotineBin(self.size, self.rotation, self.rMerge, self.split_heuristic)
+        clone.free_area = self.free_area
+        clone._max_free_sides = self._max_free_sides
+        clone.freerects = self.freerects.copy()
+        clone._freerects_by_bottom = _copy_edge_index(self._freerects_by_bottom)
+        clone._freerects_by_top = _copy_edge_index(self._freerects_by_top)
+        clone._freerects_by_left = _copy_edge_index(self._freerects_by_left)
+        clone._freerects_by_right = _copy_edge_index(self._freerects_by_right)
+        clone.columns = self.columns.copy(ids=(item.id for item in items))
+        return clone
+
     def bin_stats(self) -> dict:
         """
         Returns a dictionary with compiled stats on the bin tree
@@ -228,20 +341,124 @@ class GuillotineBin:
         return stats
 
 
+def _index_edge(index: _EdgeIndex, edge: typing.Tuple[float, float, float], rect: FreeRectangle) -> None:
+    rects = index.get(edge)
+    if rects is None:
+        index[edge] = [rect]
+    else:
+        rects.append(rect)
+
+
+def _unindex_edge(index: _EdgeIndex, edge: typing.Tuple[float, float, float], rect: FreeRectangle) -> None:
+    rects = index[edge]
+    rects.remove(rect)
+    if not rects:
+        del index[edge]
+
+
+def _copy_edge_index(index: _EdgeIndex) -> _EdgeIndex:
+    return {edge: list(rects) for edge, rects in index.items()}
+
+
+def _other_on_edge(index: _EdgeIndex, edge: typing.Tuple[float, float, float],
+                   rect: FreeRectangle) -> typing.Optional[FreeRectangle]:
+    for other in index.get(edge, ()):
+        if other is not rect:
+            return other
+    return None
+
+
+class _OpenBins:
+    """
+    Free rectangles of all bins which still could take some of remaining items, ordered
+    by area, so the best area fit across all bins is found the same way as inside a single
+    bin, and bins without enough free space are not scored at all. Bin that can't fit
+    even the smallest item (by area and by sides) is closed and never indexed again.
+    """
+
+    def __init__(self, items: List[UnpackedItem]):
+        self._smallest_item = UnpackedItem(
+            id=-1,
+            size=Size(
+                width=min((item.size.width for item in items), default=0),
+                height=min((item.size.height for item in items), default=0),
+            ),
+        )
+        # (area, bin order, free rectangle), score ties are resolved in favor of earlier bin
+        self._freerects = SortedList()
+        self._bins = []  # type: List[GuillotineBin]
+        self._order = {}  # type: typing.Dict[GuillotineBin, int]
+
+    def add(self, binn: GuillotineBin) -> None:
+        order = self._order.get(binn)
+        if order is None:
+            order = self._order[binn] = len(self._bins)
+            self._bins.append(binn)
+        if binn.could_fit(self._smallest_item):
+            self._freerects.update((rect.area, order, rect) for rect in binn.freerects)
+
+    def remove(self, binn: GuillotineBin) -> None:
+        order = self._order[binn]
+        for rect in binn.freerects:
+            self._freerects.discard((rect.area, order, rect))
+
+    def find_best(self, item: UnpackedItem) -> typing.Optional[GuillotineBin]:
+        best = None
+        item_area = item.size.area
+        for area, order, rect in self._freerects.irange((item_area,)):
+            if best is not None and area - item_area > best[0][0]:
+                break
+            binn = self._bins[order]
+            if binn._item_fits_rect(item, rect):
+                candidate = (binn._score(rect, item), order)
+                if best is None or candidate < best:
+                    best = candidate
+            if binn.rotation and binn._item_fits_rect(item, rect, rotation=True):
+                candidate = (binn._score(rect, item), order)
+                if best is None or candidate < best:
+                    best = candidate
+
+        if best is None:
+            return None
+        return self._bins[best[1]]
+
+
 class SimpleGuillotinePackStrategy(PackStrategy):
-    def __init__(self, rotation: bool = True):
+    def __init__(self, rotation: bool = True, sorting: str = "area", split_heuristic: str = "default",
+                 rectangle_merge: bool = True):
+        if sorting not in ITEM_SORTINGS:
+            raise ValueError(f"Unsupported sorting '{sorting}'. Expected one of {list(ITEM_SORTINGS)}")
+        if split_heuristic not in SPLIT_HEURISTICS:
+            raise ValueError(f"Unsupported split heuristic '{split_heuristic}'. Expected one of {SPLIT_HEURISTICS}")
         self.rotation = rotation
+        self.sorting = sorting
+        self.split_heuristic = split_heuristic
+        self.rectangle_merge = rectangle_merge
 
     def pack(self, paper_spec: SimplePaperSpec, items: List[UnpackedItem]) -> PackedDocument:
+        return PackedDocument(pages=list(self.pack_iter(paper_spec, items)))
+
+    def pack_iter(self, paper_spec: SimplePaperSpec, items: List[UnpackedItem]) -> Iterator[PackedPage]:
+        """
+        Packs items and yields every page (followed by its back page) as soon as
+        it can't take any of remaining items. Pages are yielded in document order.
+        """
         items = self._sort_items(items)
         work_area = Size(
             width=paper_spec.size.width - paper_spec.padding.left - paper_spec.padding.right,
             height=paper_spec.size.height - paper_spec.padding.top - paper_spec.padding.bottom,
         )
+        items_with_backs = {i.id for i in items if i.back_exists}
+        smallest_remaining_items = self._smallest_remaining_items(items)
 
         bins = [self._bin_factory(work_area)]
+        open_bins = _OpenBins(items)
+        open_bins.add(bins[0])
+        emitted_bins = 0
 
-        for item in items:
+        item_idx = 0
+        while item_idx < len(items):
+            item = items[item_idx]
             # Ensure item can theoretically fit the bin
             item_fits = False
             if (item.size.width <= work_area.width and
@@ -255,45 +472,95 @@ class SimpleGuillotinePackStrategy(PackStrategy):
             if not item_fits:
                 raise ValueError("Error! item too big for bin")
 
-            scores = []
-            for binn in bins:
-                s, _, _ = binn._find_best_score(item)[:3]
-                if s is not None:
-                    scores.append((s, binn))
-            if scores:
-                _, best_bin = min(scores, key=lambda x: x[0])
+            best_bin = open_bins.find_best(item)
+            if best_bin is None:
+                best_bin = self._bin_factory(work_area)
+                bins.append(best_bin)
+            else:
+                # bin is indexed by its free space, so it is reindexed after insert
+                open_bins.remove(best_bin)
+
+            if len(best_bin.columns) != 0:
                 best_bin.insert(item)
-                continue
+                item_idx += 1
+                open_bins.add(best_bin)
+            else:
+                bins_count = len(bins)
+                item_idx = self._pack_identical_items(bins, best_bin, items, item_idx)
+                open_bins.add(best_bin)
+                for new_bin in bins[bins_count:]:
+                    open_bins.add(new_bin)
+
+            # bin which can't fit the smallest of remaining items never changes again
+            smallest_remaining_item = smallest_remaining_items[item_idx]
+            while emitted_bins < len(bins) and not bins[emitted_bins].could_fit(smallest_remaining_item):
+                yield from self._make_pages(paper_spec, bins[emitted_bins], items_with_backs)
+                emitted_bins += 1
+
+        for binn in bins[emitted_bins:]:
+            yield from self._make_pages(paper_spec, binn, items_with_backs)
 
-            new_bin = self._bin_factory(work_area)
-            new_bin.insert(item)
-            bins.append(new_bin)
+    @staticmethod
+    def _make_pages(paper_spec: SimplePaperSpec, binn: GuillotineBin, items_with_backs: set) -> List[PackedPage]:
+        packed_columns = binn.columns.translated(paper_spec.padding.left, paper_spec.padding.top)
 
-        items_with_backs = {i.id for i in items if i.back_exists}
+        packed_page = PackedPage(size=paper_spec.size, columns=packed_columns)
+        back_page = generate_back_page(packed_page, items_with_backs, paper_spec.duplex, paper_spec.portrait)
+        if len(back_page.columns) != 0:
+            return [packed_page, back_page]
+        return [packed_page]
+
+    @staticmethod
+    def _smallest_remaining_items(items: List[UnpackedItem]) -> List[UnpackedItem]:
+        """
+        Returns list where i-th element has the smallest width and the smallest height among
+        items starting from i-th, the last one stands for no remaining items and fits nowhere.
+        """
+        smallest_items = [UnpackedItem(id=-1, size=Size(math.inf, math.inf))]
+        for item in reversed(items):
+            smallest_size = smallest_items[-1].size
+            smallest_items.append(UnpackedItem(id=-1, size=Size(
+                width=min(smallest_size.width, item.size.width),
+                height=min(smallest_size.height, item.size.height),
+            )))
+        smallest_items.reverse()
+        return smallest_items
+
+    @staticmethod
+    def _pack_identical_items(bins: List[GuillotineBin], empty_bin: GuillotineBin,
+                              items: List[UnpackedItem], start_idx: int) -> int:
+        """
+        Fast path for run of identical items started in empty bin.
+        None of other bins fit item of this size, so the whole run goes to empty bin
+        until it is full, and then to new bins with exactly the same layout. Layout is
+        computed once and stamped to new bins, only the last partial bin is packed
+        item by item. Returns index of the first item not packed yet.
+        """
+        item_size = items[start_idx].size
+        end_idx = start_idx
+        while end_idx < len(items) and items[end_idx].size == item_size:
+            end_idx += 1
+
+        item_idx = start_idx
+        while item_idx < end_idx and empty_bin.insert(items[item_idx]):
+            item_idx += 1
 
-        packed_pages = []
-        for binn in bins:
-            packed_items = []
-            for bin_item in binn.items:
-                item_pos = bin_item.position
-                item_pos.x += paper_spec.padding.left
-                item_pos.y += paper_spec.padding.top
-                packed_items.append(bin_item)
+        items_per_bin = item_idx - start_idx
+        if items_per_bin == 0:
+            # caller checks that item fits empty bin, so item is never skipped silently
+            raise ValueError(f"Item {items[start_idx].id} of size {item_size} doesn't fit empty bin")
 
-            packed_page = PackedPage(size=paper_spec.size, items=packed_items)
-            packed_pages.append(packed_page)
-            back_page = generate_back_page(packed_page, items_with_backs)
-            if len(back_page.items) != 0:
-                packed_pages.append(back_page)
+        while end_idx - item_idx >= items_per_bin:
+            bins.append(empty_bin.clone_layout(items[item_idx:item_idx + items_per_bin]))
+            item_idx += items_per_bin
 
-        return PackedDocument(pages=packed_pages)
+        return item_idx
 
     def _bin_factory(self, work_area: Size):
-        return GuillotineBin(work_area, self.rotation)
+        return GuillotineBin(work_area, self.rotation, self.rectangle_merge, self.split_heuristic)
 
     def _sort_items(self, components: List[UnpackedItem]) -> List[UnpackedItem]:
-        key = lambda el: el.size.width * el.size.height
-        components.sort(key=key, reverse=True)
+        components.sort(key=ITEM_SORTINGS[self.sorting], reverse=True)
         return components
 
     def supported_paper(self) -> List[Type[PaperSpec]]:
@@ -1,27 +1,45 @@
-from pnp_toolkit.core.binpack.input_types import Size, Position
-from pnp_toolkit.core.binpack.output_types import PackedPage, PackedItemFront, PackedItemBack
+from array import array
+from itertools import compress
 
+from pnp_toolkit.core.binpack.input_types import DuplexSpec
+from pnp_toolkit.core.binpack.output_types import PackedPage, PackedItemColumns, PACKED_ITEM_FRONT, \
+    PACKED_ITEM_BACK
 
-def generate_back_page(front_page: PackedPage, items_with_back: set) -> PackedPage:
+
+def generate_back_page(front_page: PackedPage, items_with_back: set, duplex: DuplexSpec = DuplexSpec(),
+                       portrait: bool = True) -> PackedPage:
+    """
+    Places backs of items behind their fronts. Whole page is transformed column by column:
+    positions are mirrored around the axis paper is flipped by duplex printer, and then
+    moved by duplex offset. Orientation is the one of paper, not of the page content.
+    """
     page_size = front_page.size
-    packed_backs = []
+    fronts = front_page.columns
 
-    for front_item in front_page.items:
-        if not isinstance(front_item, PackedItemFront):
-            continue
-        if front_item.id not in items_with_back:
-            continue
+    selected = [
+        kind == PACKED_ITEM_FRONT and item_id in items_with_back
+        for kind, item_id in zip(fronts.kinds, fronts.ids)
+    ]
 
-        item_back = PackedItemBack(
-            id=front_item.id,
-            size=front_item.size,
-            rotated=front_item.rotated,
-            position=Position(
-                x=page_size.width-front_item.position.x-front_item.size.width,
-                y=front_item.position.y,
-            )
-        )
+    backs = PackedItemColumns()
+    backs.ids = array(fronts.ids.typecode, compress(fronts.ids, selected))
+    backs.kinds = array(fronts.kinds.typecode, [PACKED_ITEM_BACK]) * len(backs.ids)
+    backs.widths = array(fronts.widths.typecode, compress(fronts.widths, selected))
+    backs.heights = array(fronts.heights.typecode, compress(fronts.heights, selected))
+    xs = compress(fronts.xs, selected)
+    ys = compress(fronts.ys, selected)
+    rotated = compress(fronts.rotated, selected)
 
-        packed_backs.append(item_back)
+    if duplex.mirrors_left_to_right(portrait):
+        right = page_size.width + duplex.offset_x
+        backs.xs = array("d", (right - x - width for x, width in zip(xs, backs.widths)))
+        backs.ys = array("d", (y + duplex.offset_y for y in ys))
+        # top of rotated item is turned to the opposite side
+        backs.rotated = array(fronts.rotated.typecode, (-turn for turn in rotated))
+    else:
+        bottom = page_size.height + duplex.offset_y
+        backs.xs = array("d", (x + duplex.offset_x for x in xs))
+        backs.ys = array("d", (bottom - y - height for y, height in zip(ys, backs.heights)))
+        backs.rotated = array(fronts.rotated.typecode, rotated)
 
-    return PackedPage(page_size, packed_backs)
+    return PackedPage(page_size, columns=backs)
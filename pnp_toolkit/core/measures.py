@@ -33,7 +33,7 @@ def parse_pair_mm(measure_pair: str) -> typing.Tuple[float, float]:
 
 def _parse_raw_measure(measure: str):
     measure = measure.strip()
-    match = re.match(r"(?P<value>\d+(.\d+)?)\s*(?P<unit>\w*)?", measure)
+    match = re.match(r"(?P<value>-?\d+(.\d+)?)\s*(?P<unit>\w*)?", measure)
     return float(match["value"]), match["unit"] or None
 
 
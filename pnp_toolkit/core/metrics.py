@@ -0,0 +1,147 @@
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Iterable, Iterator, TypeVar
+
+try:
+    import resource
+except ImportError:  # windows
+    resource = None
+
+from pnp_toolkit.core.binpack.output_types import PackedPage
+
+T = TypeVar("T")
+
+# wait - writer waits for images prepared by workers, long wait means workers should be scaled
+METRIC_STAGES = ["glob", "probe", "read", "decode", "pack", "encode", "wait", "write"]
+METRIC_COUNTERS = [
+    "bytes_read", "bytes_written", "images_decoded",
+    "image_cache_hits", "image_cache_misses", "pack_cache_hits", "pack_cache_misses",
+]
+
+# cpu time of current thread only, stages run in many threads at once
+_thread_time = getattr(time, "thread_time", time.process_time)
+_END_OF_ITERATION = object()
+
+
+@dataclass
+class StageMetrics:
+    """ Time summed over all runs of stage, runs in worker pools could overlap """
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    calls: int = 0
+
+
+@dataclass
+class DocumentMetrics:
+    """
+    Metrics of single document build, collected from all threads working on it.
+    Peak RSS is measured for whole process, so it covers all documents built at once.
+    """
+    name: str
+    stages: Dict[str, StageMetrics] = field(default_factory=lambda: {stage: StageMetrics() for stage in METRIC_STAGES})
+    counters: Dict[str, int] = field(default_factory=lambda: dict.fromkeys(METRIC_COUNTERS, 0))
+    pages: int = 0
+    paper_area: float = 0.0
+    items_area: float = 0.0
+    peak_rss_bytes: Optional[int] = None
+    error: Optional[str] = None
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+
+    @property
+    def paper_utilization(self) -> float:
+        return self.items_area / self.paper_area if self.paper_area else 0.0
+
+    @contextmanager
+    def measure(self, stage: str):
+        wall_start = time.perf_counter()
+        cpu_start = _thread_time()
+        try:
+            yield
+        finally:
+            wall_seconds = time.perf_counter() - wall_start
+            cpu_seconds = _thread_time() - cpu_start
+            with self._lock:
+                stage_metrics = self.stages[stage]
+                stage_metrics.wall_seconds += wall_seconds
+                stage_metrics.cpu_seconds += cpu_seconds
+                stage_metrics.calls += 1
+
+    def measure_iter(self, stage: str, iterable: Iterable[T]) -> Iterator[T]:
+        """ Measures producing of every value, time spent by consumer is not counted """
+        iterator = iter(iterable)
+        while True:
+            with self.measure(stage):
+                value = next(iterator, _END_OF_ITERATION)
+            if value is _END_OF_ITERATION:
+                return
+            yield value
+
+    def count(self, counter: str, value: int = 1):
+        with self._lock:
+            self.counters[counter] += value
+
+    def add_page(self, page: PackedPage):
+        items_area = sum(width * height for width, height in zip(page.columns.widths, page.columns.heights))
+        with self._lock:
+            self.pages += 1
+            self.paper_area += page.size.area
+            self.items_area += items_area
+
+    def finish(self, error: Optional[BaseException] = None):
+        self.peak_rss_bytes = peak_rss_bytes()
+        if error is not None:
+            self.error = str(error)
+
+    def to_json(self) -> dict:
+        return {
+            "name": self.name,
+            "stages": {
+                stage: {
+                    "wall_seconds": round(metrics.wall_seconds, 6),
+                    "cpu_seconds": round(metrics.cpu_seconds, 6),
+                    "calls": metrics.calls,
+                }
+                for stage, metrics in self.stages.items()
+            },
+            **self.counters,
+            "pages": self.pages,
+            "paper_utilization": round(self.paper_utilization, 4),
+            "peak_rss_bytes": self.peak_rss_bytes,
+            "error": self.error,
+        }
+
+
+def counted_pages(metrics: Optional[DocumentMetrics], pages: Iterable[PackedPage]) -> Iterator[PackedPage]:
+    for page in pages:
+        if metrics is not None:
+            metrics.add_page(page)
+        yield page
+
+
+def peak_rss_bytes() -> Optional[int]:
+    if resource is None:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # linux reports kilobytes, macos reports bytes
+    return peak_rss if sys.platform == "darwin" else peak_rss * 1024
+
+
+@contextmanager
+def measure(metrics: Optional[DocumentMetrics], stage: str):
+    """ Same as DocumentMetrics.measure, but also accepts missing metrics """
+    if metrics is None:
+        yield
+        return
+    with metrics.measure(stage):
+        yield
+
+
+def count(metrics: Optional[DocumentMetrics], counter: str, value: int = 1):
+    if metrics is not None:
+        metrics.count(counter, value)
+
@@ -1,35 +1,80 @@
 import logging
 import multiprocessing
+import threading
 from collections import namedtuple
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future
 from datetime import datetime
 from pathlib import Path
-from typing import List, Tuple, Optional
-from PIL import Image, ImageOps
+from typing import List, Tuple, Optional, Dict
 
-from pnp_toolkit.core.binpack.input_types import SimplePaperSpec, Padding, Size, RollPaperSpec, PaperSpec, UnpackedItem
+from pnp_toolkit.core.binpack.cache import PackCache, CachedPackStrategy
+from pnp_toolkit.core.binpack.input_types import SimplePaperSpec, Padding, Size, RollPaperSpec, PaperSpec, \
+    UnpackedItem, DuplexSpec
 from pnp_toolkit.core.binpack.strategy.base import PackStrategy
 from pnp_toolkit.core.binpack.strategy.roll_guillotine import RollGuillotinePackStrategy
+from pnp_toolkit.core.binpack.strategy.search import SearchPackStrategy, DEFAULT_SEARCH_TIME_BUDGET
 from pnp_toolkit.core.binpack.strategy.simple_guillotine import SimpleGuillotinePackStrategy
+from pnp_toolkit.core.pipeline.profiling import DocumentProfiler
+from pnp_toolkit.core.pipeline.probe import probe_images, warn_aspect_ratio_mismatches
+from pnp_toolkit.core.pipeline.stages import StageExecutors, iterate_in_background, DEFAULT_STAGE_QUEUE_SIZE
+from pnp_toolkit.core.pipeline.manifest import BuildManifest, MANIFEST_FILE_NAME, document_fingerprint, \
+    toolkit_version
+from pnp_toolkit.core.metrics import DocumentMetrics, counted_pages
 from pnp_toolkit.core.measures import DistanceMeasure4D, DistanceMeasure2D, DistanceMeasure1D
 from pnp_toolkit.core.render.base import OutputRenderer
+from pnp_toolkit.core.render.image_cache import ImageCache, DEFAULT_IMAGE_CACHE_SIZE
 from pnp_toolkit.core.render.pdf import PDFOutputRenderer
-from pnp_toolkit.core.render.types import RenderDocumentFlow
+from pnp_toolkit.core.render.types import RenderDocumentFlow, ImageHandle
 from pnp_toolkit.core.spec.base import BGSpecification, DocumentSpecification, PaperSpecification, \
     PackStrategySpecification, OutputRendererSpecification, ComponentSpecification, BackImageSpecification, MultiGlob
 from pnp_toolkit.core.spec.generic_parse import resolve_variable
 from pnp_toolkit.core.spec.yaml_parse import _resolve_multi_glob_variable
+from pnp_toolkit.core.utils import DirectoryScanCache, resolve_glob_pathes, MemoryBudget
 
 
 BinPackFlow = namedtuple("BinPackFlow", ["items", "front_images", "back_images"])
 
+EXECUTOR_TYPES = ["thread", "process"]
+
 
 class BuildPipeline:
-    def __init__(self, *, max_concurrency: Optional[int] = None):
+    def __init__(self, *,
+                 max_concurrency: Optional[int] = None,
+                 executor: str = "thread",
+                 image_cache_dir: Optional[Path] = None,
+                 image_cache_size: int = DEFAULT_IMAGE_CACHE_SIZE,
+                 pack_cache_dir: Optional[Path] = None,
+                 force: bool = False,
+                 io_workers: Optional[int] = None,
+                 cpu_workers: Optional[int] = None,
+                 stage_queue_size: int = DEFAULT_STAGE_QUEUE_SIZE,
+                 memory_limit: Optional[int] = None,
+                 profile: bool = False):
         if not max_concurrency:
             max_concurrency = multiprocessing.cpu_count()
+        if executor not in EXECUTOR_TYPES:
+            raise ValueError(f"Unsupported executor type '{executor}'. Expected one of {EXECUTOR_TYPES}")
         self._max_concurrency = max_concurrency
+        self._executor = executor
+        self._image_cache_dir = image_cache_dir
+        self._image_cache_size = image_cache_size
+        self._image_cache = ImageCache(image_cache_dir, image_cache_size) if image_cache_dir else None
+        self._pack_cache_dir = pack_cache_dir
+        self._pack_cache = PackCache(pack_cache_dir, version=toolkit_version())
+        self._force = force
+        # max_concurrency limits documents built (and written) at once,
+        # stage workers are shared by all of them
+        self._io_workers = io_workers
+        self._cpu_workers = cpu_workers
+        self._stage_queue_size = stage_queue_size
+        # decoded images of all documents built at once stay within the limit
+        self._memory_limit = memory_limit
+        self._memory_budget = MemoryBudget(memory_limit)
+        # every document is profiled, profiles are saved next to its output
+        self._profile = profile
+        self._scan_cache = DirectoryScanCache()
         self._process_status_changed_handlers = []
+        self._document_metrics_handlers = []
 
     def on_process_status_changed(self, handler):
         self._process_status_changed_handlers.append(handler)
@@ -38,88 +83,290 @@ class BuildPipeline:
         for handler in self._process_status_changed_handlers:
             handler(doc, completion, status)
 
+    def on_document_metrics(self, handler):
+        """ Handler receives document and its metrics (as json dict) when document build is finished or failed """
+        self._document_metrics_handlers.append(handler)
+
+    def emit_document_metrics(self, doc: DocumentSpecification, metrics: dict):
+        for handler in self._document_metrics_handlers:
+            handler(doc, metrics)
+
     def process_all(self, spec: BGSpecification):
         self.process_specific(spec, [doc.name for doc in spec.documents])
 
     def process_specific(self, spec: BGSpecification, doc_names: List[str]):
         task_create_datetime = datetime.now()
+        manifest = BuildManifest(spec.output.directory / MANIFEST_FILE_NAME)
+
+        # tree is scanned once per build, for all patterns of selected documents together
+        self._scan_cache = DirectoryScanCache()
+        self._scan_document_inputs([doc for doc in spec.documents if doc.name in doc_names], spec)
+
+        docs = []
+        fingerprints = []
+        for doc in spec.documents:
+            if doc.name not in doc_names:
+                continue
+
+            fingerprint = self._document_fingerprint(doc, spec)
+            if not self._force and fingerprint and manifest.is_up_to_date(doc.name, fingerprint):
+                self.emit_process_status_changed(doc, 1.0, "up to date")
+                continue
+
+            docs.append(doc)
+            fingerprints.append(fingerprint)
+
+        if not docs:
+            return
+
+        if self._executor == "process":
+            output_paths = self._process_in_worker_processes(docs, spec, task_create_datetime.isoformat())
+        else:
+            output_paths = self._process_in_threads(docs, spec, task_create_datetime.isoformat())
+
+        for doc, fingerprint, output_path in zip(docs, fingerprints, output_paths):
+            if fingerprint and output_path:
+                manifest.update(doc.name, fingerprint, output_path)
+        manifest.save()
+
+    def _process_in_threads(self, docs: List[DocumentSpecification], spec: BGSpecification,
+                            task_create_datetime: str) -> List[Optional[Path]]:
+        with StageExecutors(self._io_workers, self._cpu_workers) as stage_executors:
+            with ThreadPoolExecutor(max_workers=self._max_concurrency) as executor:
+                futures = [
+                    executor.submit(BuildPipeline._process_single, self, doc, spec, task_create_datetime,
+                                    stage_executors)
+                    for doc in docs
+                ]
+
+        return [self._get_output_path(future) for future in futures]
+
+    def _process_in_worker_processes(self, docs: List[DocumentSpecification], spec: BGSpecification,
+                                     task_create_datetime: str) -> List[Optional[Path]]:
+        # every document is processed by separate worker process, status events
+        # are sent back through queue and re-emitted from parent process
+        with multiprocessing.Manager() as manager:
+            status_queue = manager.Queue()
+            forwarder = threading.Thread(
+                target=self._forward_worker_status_events,
+                args=(docs, status_queue),
+                daemon=True,
+            )
+            forwarder.start()
+
+            try:
+                with ProcessPoolExecutor(max_workers=self._max_concurrency) as executor:
+                    futures = [
+                        executor.submit(_process_single_in_worker, doc_idx, doc, spec, task_create_datetime,
+                                        status_queue, self._worker_options())
+                        for doc_idx, doc in enumerate(docs)
+                    ]
+            finally:
+                status_queue.put(None)
+                forwarder.join()
+
+        return [self._get_output_path(future) for future in futures]
+
+    @staticmethod
+    def _get_output_path(future: Future) -> Optional[Path]:
+        # errors are already logged and reported through status events
+        if future.exception() is not None:
+            return None
+        return future.result()
+
+    def _worker_options(self) -> dict:
+        return {
+            "image_cache_dir": self._image_cache_dir,
+            "image_cache_size": self._image_cache_size,
+            "pack_cache_dir": self._pack_cache_dir,
+            "io_workers": self._io_workers,
+            "cpu_workers": self._cpu_workers,
+            "stage_queue_size": self._stage_queue_size,
+            # budget can't be shared between processes, so every worker gets equal part of it
+            "memory_limit": self._memory_limit // self._max_concurrency if self._memory_limit else None,
+            "profile": self._profile,
+        }
+
+    def _forward_worker_status_events(self, docs: List[DocumentSpecification], status_queue):
+        while True:
+            event = status_queue.get()
+            if event is None:
+                return
+
+            event_type, doc_idx, *payload = event
+            if event_type == "metrics":
+                self.emit_document_metrics(docs[doc_idx], *payload)
+            else:
+                self.emit_process_status_changed(docs[doc_idx], *payload)
+
+    def _document_fingerprint(self, doc: DocumentSpecification, spec: BGSpecification) -> Optional[str]:
+        try:
+            return document_fingerprint(doc, spec, self._resolve_document_inputs(doc, spec, self._scan_cache))
+        except Exception as e:
+            logging.warning(f"Failed to fingerprint document '{doc.name}', it will be rebuilt: {e}")
+            return None
+
+    def _scan_document_inputs(self, docs: List[DocumentSpecification], spec: BGSpecification):
+        try:
+            glob_paths = [
+                glob_path
+                for doc in docs
+                for multi_glob in self._document_input_globs(doc, spec)
+                for glob_path in multi_glob.glob_path
+            ]
+            resolve_glob_pathes(glob_paths, self._scan_cache)
+        except Exception as e:
+            # broken document is reported later, when it is processed itself
+            logging.warning(f"Failed to scan document inputs: {e}")
+
+    @staticmethod
+    def _resolve_document_inputs(doc: DocumentSpecification, spec: BGSpecification,
+                                 scan_cache: Optional[DirectoryScanCache] = None) -> List[Path]:
+        input_paths = []
+        for multi_glob in BuildPipeline._document_input_globs(doc, spec):
+            input_paths.extend(multi_glob.resolve(scan_cache))
+        return input_paths
+
+    @staticmethod
+    def _document_input_globs(doc: DocumentSpecification, spec: BGSpecification) -> List[MultiGlob]:
+        multi_globs = []
+        for com in doc.components:
+            multi_globs.append(doc.src.combine(com.front_images.src))
 
-        with ThreadPoolExecutor(max_workers=self._max_concurrency) as executor:
-            for doc in spec.documents:
-                if doc.name not in doc_names:
-                    continue
+            if com.back_images.type == "first_image":
+                back_image_src = MultiGlob(_resolve_multi_glob_variable(com.back_images.type_params["src"], spec.variables))
+                multi_globs.append(doc.src.combine(back_image_src))
 
-                executor.submit(BuildPipeline._process_single, self, doc, spec, task_create_datetime.isoformat())
-                # self._process_single(doc, spec, task_create_datetime.isoformat())
+        return multi_globs
 
-    def _process_single(self, doc: DocumentSpecification, spec: BGSpecification, task_create_datetime: str):
+    def _process_single(self, doc: DocumentSpecification, spec: BGSpecification, task_create_datetime: str,
+                        stage_executors: StageExecutors) -> Path:
         self.emit_process_status_changed(doc, 0.0, "prepare document for process")
+        metrics = DocumentMetrics(doc.name)
+        profiler = DocumentProfiler() if self._profile else None
+        output_path = None
         try:
+            if profiler:
+                profiler.start()
+
             binpack_paper = self._convert_paper_spec_to_binpack_paper(doc.paper, spec)
-            binpack_strategy = self._convert_binpack_strategy(doc.pack_strategy, spec)
+            binpack_strategy = CachedPackStrategy(
+                self._convert_binpack_strategy(doc.pack_strategy, spec),
+                self._pack_cache,
+                metrics,
+            )
 
             if type(binpack_paper) not in binpack_strategy.supported_paper():
                 raise ValueError(f"Selected strategy '{doc.pack_strategy.name}' not support paper type '{doc.paper.name}'")
 
             output_path = self._build_output_path(doc, spec, task_create_datetime)
-            output_renderer = self._convert_output_renderer(doc.output_renderer, output_path, spec)
-
-            self.emit_process_status_changed(doc, 1/4, "prepare components for packing")
-            binpack_flow = self._convert_component_specs_to_binpack_flow(doc.components, doc, spec.variables)
-
-            self.emit_process_status_changed(doc, 2/4, "pack components")
-            packed_document = binpack_strategy.pack(binpack_paper, binpack_flow.items)
+            output_renderer = self._convert_output_renderer(doc.output_renderer, output_path, spec, self._image_cache,
+                                                            stage_executors, self._memory_budget, metrics)
+
+            self.emit_process_status_changed(doc, 1/5, "prepare components for packing")
+            with metrics.measure("glob"):
+                binpack_flow = self._convert_component_specs_to_binpack_flow(doc.components, doc, spec.variables,
+                                                                            self._scan_cache)
+
+            self.emit_process_status_changed(doc, 2/5, "probe images")
+            with metrics.measure("probe"):
+                decoded_sizes = self._probe_images(binpack_flow, stage_executors)
+
+            self.emit_process_status_changed(doc, 3/5, "pack components")
+            # pages are packed in background while renderer consumes them,
+            # bounded queue keeps packer just a few pages ahead
+            packed_pages = metrics.measure_iter("pack", binpack_strategy.pack_iter(binpack_paper, binpack_flow.items))
+            if profiler:
+                packed_pages = profiler.profile_iter(packed_pages)
+            packed_pages = iterate_in_background(
+                packed_pages,
+                max_size=self._stage_queue_size,
+                name=f"pnp-pack-{doc.name}",
+            )
 
             render_flow = RenderDocumentFlow(
-                packed_document=packed_document,
+                pages=counted_pages(metrics, packed_pages),
                 front_images=binpack_flow.front_images,
-                back_images=binpack_flow.back_images
+                back_images=binpack_flow.back_images,
+                decoded_sizes=decoded_sizes,
             )
 
-            self.emit_process_status_changed(doc, 3/4, "render packed document")
+            self.emit_process_status_changed(doc, 4/5, "render packed document")
             output_renderer.render(render_flow)
-            self.emit_process_status_changed(doc, 4/4, "complete")
+            self.emit_process_status_changed(doc, 5/5, "complete")
+            metrics.finish()
+            return output_path
         except Exception as e:
             logging.exception(f"error")
             self.emit_process_status_changed(doc, 0, f"err: {str(e)}")
+            metrics.finish(e)
             raise e
+        finally:
+            if profiler:
+                profiler.stop()
+                self._save_profile(doc, profiler, output_path)
+            self.emit_document_metrics(doc, metrics.to_json())
 
+    @staticmethod
+    def _save_profile(doc: DocumentSpecification, profiler: DocumentProfiler, output_path: Optional[Path]):
+        if output_path is None:
+            logging.warning(f"Profile of document '{doc.name}' is dropped, it failed before output path is known")
+            return
+
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        for profile_path in profiler.save(output_path):
+            logging.info(f"Profile of document '{doc.name}' saved to '{profile_path}'")
+
+    @staticmethod
+    def _probe_images(binpack_flow: BinPackFlow, stage_executors: StageExecutors) -> Dict[Path, int]:
+        # only headers are read, broken images fail the document before packing and
+        # rendering, while full decoding is left to renderer
+        expected_sizes = [
+            (images[item.id].path, item.size)
+            for item in binpack_flow.items
+            for images in (binpack_flow.front_images, binpack_flow.back_images)
+            if item.id in images
+        ]
+        probes = probe_images((path for path, _ in expected_sizes), executor=stage_executors.io)
+        warn_aspect_ratio_mismatches(probes, expected_sizes)
+        return {path: probe.decoded_size for path, probe in probes.items()}
 
     @staticmethod
-    def _convert_component_specs_to_binpack_flow(component_item: List[ComponentSpecification], doc: DocumentSpecification, variables: dict) -> BinPackFlow:
+    def _convert_component_specs_to_binpack_flow(component_item: List[ComponentSpecification], doc: DocumentSpecification, variables: dict,
+                                                 scan_cache: Optional[DirectoryScanCache] = None) -> BinPackFlow:
         unpacked_items = []
         front_images = {}
         back_images = {}
         idx = 0
 
         for com in component_item:
-            back_image_factory = BuildPipeline._get_back_image_factory(com.back_images, doc, variables)
+            back_image_factory = BuildPipeline._get_back_image_factory(com.back_images, doc, variables, scan_cache)
 
-            front_image_paths = doc.src.combine(com.front_images.src).resolve()
+            front_image_paths = doc.src.combine(com.front_images.src).resolve(scan_cache)
             for front_image_path in front_image_paths:
-                front_image_pil = BuildPipeline._read_pillow_image(front_image_path)
+                front_image = ImageHandle(
+                    path=front_image_path,
+                    mirror_vertical=com.front_images.mirror_vertical,
+                    mirror_horizontal=com.front_images.mirror_horizontal,
+                )
 
-                if com.front_images.mirror_vertical:
-                    front_image_pil = ImageOps.flip(front_image_pil)
-                if com.front_images.mirror_horizontal:
-                    front_image_pil = ImageOps.mirror(front_image_pil)
-
-                back_image_pil = back_image_factory(front_image_path)
+                back_image = back_image_factory(front_image_path)
                 mm_size = com.size.to_mm()
                 raw_size = Size(mm_size.x, mm_size.y)
-                unpacked_item = UnpackedItem(id=idx, size=raw_size, back_exists=back_image_pil is not None)
+                unpacked_item = UnpackedItem(id=idx, size=raw_size, back_exists=back_image is not None)
 
                 unpacked_items.append(unpacked_item)
-                front_images[idx] = front_image_pil
+                front_images[idx] = front_image
                 if unpacked_item.back_exists:
-                    back_images[idx] = back_image_pil
+                    back_images[idx] = back_image
 
                 idx += 1
 
         return BinPackFlow(unpacked_items, front_images, back_images)
 
     @staticmethod
-    def _get_back_image_factory(back_image: BackImageSpecification, doc: DocumentSpecification, variables: dict):
+    def _get_back_image_factory(back_image: BackImageSpecification, doc: DocumentSpecification, variables: dict,
+                                scan_cache: Optional[DirectoryScanCache] = None):
         params = back_image.type_params
 
         if back_image.type == "none":
@@ -127,21 +374,15 @@ class BuildPipeline:
 
         if back_image.type == "first_image":
             back_image_src = MultiGlob(_resolve_multi_glob_variable(params["src"], variables))
-            resolved_back_images = doc.src.combine(back_image_src).resolve()
+            resolved_back_images = doc.src.combine(back_image_src).resolve(scan_cache)
             if not resolved_back_images:
                 raise ValueError(f"Back image by path {back_image_src.glob_path} not found")
-            first_back_image_path = resolved_back_images[0]
-            first_back_image_pil = BuildPipeline._read_pillow_image(first_back_image_path)
+            first_back_image = ImageHandle(path=resolved_back_images[0])
 
-            return lambda _: first_back_image_pil
+            return lambda _: first_back_image
 
         raise ValueError(f"Not supported back image type {back_image.type}")
 
-    @staticmethod
-    def _read_pillow_image(path: Path):
-        with Image.open(path) as orig:
-            return orig.copy()
-
     @staticmethod
     def _build_output_path(doc: DocumentSpecification, spec: BGSpecification, task_create_datetime: str):
         output_info = spec.output
@@ -158,11 +399,25 @@ class BuildPipeline:
         return base_path / format_path
 
     @staticmethod
-    def _convert_output_renderer(renderer_spec: OutputRendererSpecification, output_path: Path, spec: BGSpecification) -> OutputRenderer:
-        params = renderer_spec.name
+    def _convert_output_renderer(renderer_spec: OutputRendererSpecification, output_path: Path, spec: BGSpecification,
+                                 image_cache: Optional[ImageCache] = None,
+                                 stage_executors: Optional[StageExecutors] = None,
+                                 memory_budget: Optional[MemoryBudget] = None,
+                                 metrics: Optional[DocumentMetrics] = None) -> OutputRenderer:
+        params = renderer_spec.params
         if renderer_spec.name == "pdf":
+            workers = params.get("workers")
+            dpi = params.get("dpi")
             return PDFOutputRenderer(
                 output_path=output_path,
+                max_workers=int(workers) if workers else None,
+                image_cache=image_cache,
+                dpi=float(dpi) if dpi else None,
+                encoding=params.get("encoding", "png"),
+                io_executor=stage_executors.io if stage_executors else None,
+                cpu_executor=stage_executors.cpu if stage_executors else None,
+                memory_budget=memory_budget,
+                metrics=metrics,
             )
 
         raise ValueError(f"Unsupported output_renderer type '{renderer_spec.name}'")
@@ -173,11 +428,27 @@ class BuildPipeline:
 
         if strategy_spec.name == "simple_guillotine":
             rotation = params.get("rotation", False)
-            return SimpleGuillotinePackStrategy(rotation=rotation)
+            return SimpleGuillotinePackStrategy(
+                rotation=rotation,
+                sorting=params.get("sorting", "area"),
+                split_heuristic=params.get("split_heuristic", "default"),
+                rectangle_merge=params.get("rectangle_merge", True),
+            )
 
         if strategy_spec.name == "roll_guillotine":
-            # rotation = params.get("rotation", False)
-            return RollGuillotinePackStrategy()
+            rotation = params.get("rotation", False)
+            return RollGuillotinePackStrategy(rotation=rotation, sorting=params.get("sorting", "width"))
+
+        if strategy_spec.name == "search":
+            # same default as builtin "search" strategy, search explores both orientations
+            rotation = params.get("rotation", True)
+            time_budget = params.get("time_budget", DEFAULT_SEARCH_TIME_BUDGET)
+            workers = params.get("workers")
+            return SearchPackStrategy(
+                rotation=rotation,
+                time_budget=float(time_budget) if time_budget else None,
+                max_workers=int(workers) if workers else None,
+            )
 
         raise ValueError(f"Unsupported pack_strategy type '{strategy_spec.name}'")
 
@@ -194,6 +465,7 @@ class BuildPipeline:
             return SimplePaperSpec(
                 size=Size(size.x, size.y),
                 padding=Padding(padding.x, padding.y, padding.z, padding.w),
+                duplex=BuildPipeline._convert_duplex_spec(params, spec),
             )
 
         if paper_spec.type == "roll":
@@ -206,6 +478,35 @@ class BuildPipeline:
             return RollPaperSpec(
                 width=size.x,
                 padding=Padding(padding.x, padding.y, padding.z, padding.w),
+                duplex=BuildPipeline._convert_duplex_spec(params, spec),
             )
 
         raise ValueError(f"Unsupported paper type {paper_spec.type}")
+
+    @staticmethod
+    def _convert_duplex_spec(params: dict, spec: BGSpecification) -> DuplexSpec:
+        # offset of back side measured for specific printer, as example "0.5*-1mm"
+        raw_offset = resolve_variable(params.get("duplex_offset", "0*0mm"), spec.variables)
+        offset = DistanceMeasure2D.parse_from(raw_offset).to_mm()
+
+        return DuplexSpec(
+            # without duplex_flip backs are mirrored left to right for any paper orientation
+            flip=params.get("duplex_flip"),
+            offset_x=offset.x,
+            offset_y=offset.y,
+        )
+
+
+def _process_single_in_worker(doc_idx: int, doc: DocumentSpecification, spec: BGSpecification,
+                              task_create_datetime: str, status_queue, pipeline_options: dict):
+    def status_changed_handler(_doc, completion, status):
+        status_queue.put(("status", doc_idx, completion, status))
+
+    def document_metrics_handler(_doc, metrics):
+        status_queue.put(("metrics", doc_idx, metrics))
+
+    pipeline = BuildPipeline(max_concurrency=1, **pipeline_options)
+    pipeline.on_process_status_changed(status_changed_handler)
+    pipeline.on_document_metrics(document_metrics_handler)
+    with StageExecutors(pipeline._io_workers, pipeline._cpu_workers) as stage_executors:
+        return pipeline._process_single(doc, spec, task_create_datetime, stage_executors)
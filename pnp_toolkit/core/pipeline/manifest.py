@@ -0,0 +1,92 @@
+import dataclasses
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import List, Optional
+
+try:
+    from importlib import metadata as importlib_metadata
+except ImportError:  # python < 3.8
+    import importlib_metadata
+
+from pnp_toolkit.core.spec.base import BGSpecification, DocumentSpecification
+
+
+MANIFEST_FILE_NAME = ".pnp-toolkit-manifest.json"
+_MANIFEST_VERSION = 1
+
+
+class BuildManifest:
+    """
+    Stores fingerprint of every successfully built document together with its output path.
+    Document with unchanged fingerprint and still existing output can be skipped by next build.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._documents = self._load(path)
+
+    def is_up_to_date(self, doc_name: str, fingerprint: str) -> bool:
+        entry = self._documents.get(doc_name)
+        if not entry or entry["fingerprint"] != fingerprint:
+            return False
+        return Path(entry["output_path"]).exists()
+
+    def update(self, doc_name: str, fingerprint: str, output_path: Path):
+        self._documents[doc_name] = {
+            "fingerprint": fingerprint,
+            "output_path": Path(output_path).as_posix(),
+        }
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        content = json.dumps({
+            "version": _MANIFEST_VERSION,
+            "documents": self._documents,
+        }, indent=2, sort_keys=True)
+
+        temp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        temp_path.write_text(content)
+        os.replace(temp_path, self.path)
+
+    @staticmethod
+    def _load(path: Path) -> dict:
+        if not path.exists():
+            return {}
+
+        try:
+            content = json.loads(path.read_text())
+        except (OSError, ValueError) as e:
+            logging.warning(f"Build manifest '{path}' is broken and will be ignored: {e}")
+            return {}
+
+        if content.get("version") != _MANIFEST_VERSION:
+            return {}
+        return content.get("documents", {})
+
+
+def document_fingerprint(doc: DocumentSpecification, spec: BGSpecification, input_paths: List[Path]) -> str:
+    inputs = []
+    for input_path in sorted(set(Path(p) for p in input_paths)):
+        stat = input_path.stat()
+        inputs.append([input_path.as_posix(), stat.st_size, stat.st_mtime_ns])
+
+    fingerprint_content = json.dumps({
+        "toolkit_version": toolkit_version(),
+        "document": dataclasses.asdict(doc),
+        "output": dataclasses.asdict(spec.output),
+        # output name and format are resolved from variables
+        "variables": spec.variables,
+        "inputs": inputs,
+    }, sort_keys=True, default=str)
+
+    return hashlib.sha256(fingerprint_content.encode()).hexdigest()
+
+
+def toolkit_version() -> Optional[str]:
+    try:
+        return importlib_metadata.version("pnp_toolkit")
+    except importlib_metadata.PackageNotFoundError:
+        return None
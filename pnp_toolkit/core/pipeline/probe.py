@@ -0,0 +1,95 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor, Executor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Tuple, Dict, Iterable, List
+
+from PIL import Image
+
+from pnp_toolkit.core.binpack.input_types import Size
+
+
+DEFAULT_ASPECT_RATIO_TOLERANCE = 0.02  # relative difference
+
+
+@dataclass(frozen=True)
+class ImageProbe:
+    """ Image properties read from file header, pixel data stay untouched """
+    path: Path
+    width: int
+    height: int
+    mode: str
+    format: Optional[str] = None
+    dpi: Optional[Tuple[float, float]] = None
+
+    @property
+    def aspect_ratio(self) -> float:
+        return self.width / self.height
+
+    @property
+    def decoded_size(self) -> int:
+        """ Estimated size of decoded pixel data in bytes, palette images are expanded to RGB on render """
+        return self.width * self.height * max(Image.getmodebands(self.mode), 3)
+
+
+def probe_image(path: Path) -> ImageProbe:
+    # pillow reads only header on open, pixels are decoded by explicit load
+    with Image.open(path) as image:
+        dpi = image.info.get("dpi")
+        return ImageProbe(
+            path=Path(path),
+            width=image.width,
+            height=image.height,
+            mode=image.mode,
+            format=image.format,
+            dpi=(float(dpi[0]), float(dpi[1])) if dpi else None,
+        )
+
+
+def probe_images(paths: Iterable[Path], executor: Optional[Executor] = None) -> Dict[Path, ImageProbe]:
+    """
+    Probes every distinct image in parallel (by executor provided or own thread pool),
+    first failed probe raises ValueError
+    """
+    unique_paths = list(dict.fromkeys(Path(path) for path in paths))
+
+    if executor is None:
+        with ThreadPoolExecutor() as own_executor:
+            return probe_images(unique_paths, own_executor)
+
+    futures = [executor.submit(probe_image, path) for path in unique_paths]
+
+    probes = {}
+    for path, future in zip(unique_paths, futures):
+        try:
+            probes[path] = future.result()
+        except (OSError, SyntaxError) as e:
+            raise ValueError(f"Failed to read image '{path}': {e}") from e
+    return probes
+
+
+def aspect_ratio_mismatch(probe: ImageProbe, size: Size,
+                          tolerance: float = DEFAULT_ASPECT_RATIO_TOLERANCE) -> bool:
+    expected_ratio = size.width / size.height
+    return abs(probe.aspect_ratio - expected_ratio) > tolerance * expected_ratio
+
+
+def warn_aspect_ratio_mismatches(probes: Dict[Path, ImageProbe], expected_sizes: Iterable[Tuple[Path, Size]],
+                                 tolerance: float = DEFAULT_ASPECT_RATIO_TOLERANCE) -> List[Path]:
+    """ Logs warning for every image which would be stretched to its component size """
+    mismatched = []
+    checked = set()
+    for path, size in expected_sizes:
+        # same image usually placed many times with the same size
+        if (path, size.width, size.height) in checked:
+            continue
+        checked.add((path, size.width, size.height))
+
+        probe = probes[Path(path)]
+        if aspect_ratio_mismatch(probe, size, tolerance):
+            logging.warning(
+                f"Image '{path}' ({probe.width}x{probe.height}px) will be stretched to component size "
+                f"{size.width:g}x{size.height:g}mm, aspect ratios differ by more than {tolerance:.0%}"
+            )
+            mismatched.append(Path(path))
+    return mismatched
@@ -0,0 +1,171 @@
+import cProfile
+import logging
+import os
+import pstats
+import sys
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, Iterator, TypeVar, List, Optional, Set
+
+T = TypeVar("T")
+
+PSTATS_SUFFIX = ".pstats"
+COLLAPSED_STACKS_SUFFIX = ".collapsed.txt"
+DEFAULT_SAMPLING_INTERVAL = 0.005  # seconds
+
+# threads of shared worker pools (see StageExecutors), sampled for every profiled document
+_WORKER_THREAD_PREFIXES = ("pnp-io", "pnp-cpu")
+_WORKER_MACHINERY_FILES = {"threading.py", "thread.py", "queue.py"}
+
+
+class DocumentProfiler:
+    """
+    Profiles build of single document by two profilers at once:
+      cProfile (deterministic) - document thread and its pack producer thread,
+        saved as `<output>.pstats`, open it with pstats or snakeviz
+      stack sampler - document threads and shared worker pools, saved as collapsed stacks
+        `<output>.collapsed.txt`, ready for flamegraph.pl or speedscope
+
+    Worker pools are shared by documents built at once, so samples of pool threads
+    could belong to other documents as well.
+    """
+
+    def __init__(self, interval: float = DEFAULT_SAMPLING_INTERVAL):
+        self._profiles = []  # type: List[cProfile.Profile]
+        self._sampler = StackSampler(interval)
+        self._lock = threading.Lock()
+
+    def start(self):
+        """ Starts profiling of current thread, stop should be called from the same thread """
+        self._sampler.add_thread(threading.get_ident())
+        self._sampler.start()
+        self._document_profile = self._new_profile()
+        self._document_profiled = _enable_profile(self._document_profile)
+
+    def stop(self):
+        if self._document_profiled:
+            self._document_profile.disable()
+        self._sampler.stop()
+
+    def profile_iter(self, iterable: Iterable[T]) -> Iterator[T]:
+        """ Profiles producing of values in whatever thread consumes result """
+        # generator body runs only by first next call, so it is already consumer thread here
+        self._sampler.add_thread(threading.get_ident())
+        profile = self._new_profile()
+        profiled = True
+        iterator = iter(iterable)
+        while True:
+            profiled = profiled and _enable_profile(profile)
+            try:
+                value = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                if profiled:
+                    profile.disable()
+            yield value
+
+    def save(self, output_path: Path) -> List[Path]:
+        saved_paths = []
+        profiles = [profile for profile in self._profiles if _has_stats(profile)]
+        if profiles:
+            pstats_path = output_path.with_name(output_path.name + PSTATS_SUFFIX)
+            stats = pstats.Stats(profiles[0])
+            for profile in profiles[1:]:
+                stats.add(profile)
+            stats.dump_stats(str(pstats_path))
+            saved_paths.append(pstats_path)
+
+        collapsed_path = output_path.with_name(output_path.name + COLLAPSED_STACKS_SUFFIX)
+        self._sampler.save(collapsed_path)
+        saved_paths.append(collapsed_path)
+        return saved_paths
+
+    def _new_profile(self) -> cProfile.Profile:
+        profile = cProfile.Profile()
+        with self._lock:
+            self._profiles.append(profile)
+        return profile
+
+
+class StackSampler:
+    """
+    Samples stacks of selected threads (and shared worker pools) in background thread
+    and counts them in collapsed format: `thread;outer frame;...;inner frame count`
+    """
+
+    def __init__(self, interval: float = DEFAULT_SAMPLING_INTERVAL):
+        self.interval = interval
+        self._thread_idents = set()  # type: Set[int]
+        self._stacks = Counter()
+        self._stopped = threading.Event()
+        self._thread = None  # type: Optional[threading.Thread]
+
+    def add_thread(self, thread_ident: int):
+        self._thread_idents.add(thread_ident)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="pnp-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def save(self, path: Path):
+        lines = [f"{stack} {count}" for stack, count in sorted(self._stacks.items())]
+        path.write_text("\n".join(lines) + "\n" if lines else "")
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self._sample()
+
+    def _sample(self):
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_ident, frame in sys._current_frames().items():
+            thread_name = thread_names.get(thread_ident, str(thread_ident))
+            is_worker = thread_name.startswith(_WORKER_THREAD_PREFIXES)
+            if thread_ident not in self._thread_idents and not is_worker:
+                continue
+            if is_worker and _is_idle_worker(frame):
+                continue
+
+            frames = []
+            while frame is not None:
+                frames.append(_frame_label(frame))
+                frame = frame.f_back
+            # pool threads are numbered, samples of all pool threads are merged
+            thread_label = thread_name.rsplit("_", 1)[0] if is_worker else thread_name
+            self._stacks[";".join([thread_label] + frames[::-1])] += 1
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+
+def _is_idle_worker(frame) -> bool:
+    # idle pool worker has only frames of executor machinery, waiting for next task
+    while frame is not None:
+        if os.path.basename(frame.f_code.co_filename) not in _WORKER_MACHINERY_FILES:
+            return False
+        frame = frame.f_back
+    return True
+
+
+def _enable_profile(profile: cProfile.Profile) -> bool:
+    try:
+        profile.enable()
+    except ValueError as e:
+        # since python 3.12 only one deterministic profiler could be active in process,
+        # documents built at once in threads are left to stack sampler
+        logging.warning(f"Deterministic profiler is not available, only stacks are sampled: {e}")
+        return False
+    return True
+
+
+def _has_stats(profile: cProfile.Profile) -> bool:
+    profile.create_stats()
+    return bool(profile.stats)
@@ -0,0 +1,89 @@
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+DEFAULT_STAGE_QUEUE_SIZE = 4
+# I/O bound workers mostly wait for disk or network, so there are more of them than CPUs
+DEFAULT_IO_WORKERS_PER_CPU = 4
+
+_QUEUE_POLL_INTERVAL = 0.1  # seconds
+_END_OF_STAGE = object()
+
+
+class StageExecutors:
+    """
+    Worker pools shared by all documents of a build, so count of busy threads doesn't grow
+    with count of documents built together:
+      io - reading sources and image headers from disk
+      cpu - decoding, transforming and encoding images
+    Packing of each document runs in its own producer thread (see iterate_in_background)
+    and each output is written by single thread, which owns the document.
+    """
+
+    def __init__(self, io_workers: Optional[int] = None, cpu_workers: Optional[int] = None):
+        if not cpu_workers:
+            cpu_workers = multiprocessing.cpu_count()
+        if not io_workers:
+            io_workers = multiprocessing.cpu_count() * DEFAULT_IO_WORKERS_PER_CPU
+        self.io_workers = io_workers
+        self.cpu_workers = cpu_workers
+        self.io = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="pnp-io")
+        self.cpu = ThreadPoolExecutor(max_workers=cpu_workers, thread_name_prefix="pnp-cpu")
+
+    def shutdown(self, wait: bool = True):
+        self.io.shutdown(wait=wait)
+        self.cpu.shutdown(wait=wait)
+
+    def __enter__(self) -> "StageExecutors":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+
+
+def iterate_in_background(iterable: Iterable[T], max_size: int = DEFAULT_STAGE_QUEUE_SIZE,
+                          name: Optional[str] = None) -> Iterator[T]:
+    """
+    Iterates over iterable in separate producer thread, produced values are passed through
+    queue bounded by max_size, so producer never runs too far ahead of consumer. Errors of
+    producer are raised by consumer, closed consumer stops producer after its current value.
+    """
+    values = queue.Queue(maxsize=max_size)
+    stopped = threading.Event()
+
+    def put(value) -> bool:
+        while not stopped.is_set():
+            try:
+                values.put(value, timeout=_QUEUE_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for value in iterable:
+                if not put((value, None)):
+                    return
+        except BaseException as e:
+            put((_END_OF_STAGE, e))
+        else:
+            put((_END_OF_STAGE, None))
+
+    producer = threading.Thread(target=produce, name=name, daemon=True)
+    producer.start()
+
+    try:
+        while True:
+            value, error = values.get()
+            if error is not None:
+                raise error
+            if value is _END_OF_STAGE:
+                return
+            yield value
+    finally:
+        stopped.set()
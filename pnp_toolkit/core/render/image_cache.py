@@ -0,0 +1,110 @@
+import hashlib
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+from pnp_toolkit.core.render.types import ImageHandle
+
+
+DEFAULT_IMAGE_CACHE_SIZE = 1024 * 1024 * 1024  # 1GB
+
+_CACHE_FILE_SUFFIX = ".img"
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class ImageCache:
+    """
+    Content-addressed storage of preprocessed (ready for embedding) images.
+
+    Entry key is built from hash of source file content, applied transformations and
+    any extra preparation params, so renamed or touched files still hit the cache and
+    changed files never do. Total size of entries is bounded, least recently used
+    entries are evicted first (file mtime is used as access time).
+    """
+
+    def __init__(self, directory: Path, max_size: int = DEFAULT_IMAGE_CACHE_SIZE):
+        self.directory = Path(directory)
+        self.max_size = max_size
+        self._lock = threading.Lock()
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._total_size = sum(size for _, size, _ in self._scan_entries())
+        if self._total_size > self.max_size:
+            self._evict()
+
+    def make_key(self, image: ImageHandle, **params) -> str:
+        key_parts = [
+            self._hash_file(image.path),
+            f"mirror_vertical={image.mirror_vertical}",
+            f"mirror_horizontal={image.mirror_horizontal}",
+        ]
+        key_parts.extend(f"{name}={value}" for name, value in sorted(params.items()))
+        return hashlib.sha256("|".join(key_parts).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[bytes]:
+        entry_path = self._entry_path(key)
+        try:
+            data = entry_path.read_bytes()
+            os.utime(entry_path)
+        except FileNotFoundError:
+            return None
+        return data
+
+    def put(self, key: str, data: bytes):
+        entry_path = self._entry_path(key)
+        entry_path.parent.mkdir(exist_ok=True)
+
+        # write to temporary file first, concurrent readers never see partial entry
+        temp_path = entry_path.with_name(f"{entry_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        temp_path.write_bytes(data)
+
+        with self._lock:
+            # same entry could be put again, e.g. by concurrent builds, its old size is not counted anymore
+            try:
+                replaced_size = entry_path.stat().st_size
+            except FileNotFoundError:
+                replaced_size = 0
+            os.replace(temp_path, entry_path)
+
+            self._total_size += len(data) - replaced_size
+            if self._total_size > self.max_size:
+                self._evict()
+
+    def _evict(self):
+        entries = sorted(self._scan_entries(), key=lambda entry: entry[2])
+        total_size = sum(size for _, size, _ in entries)
+
+        for entry_path, size, _ in entries:
+            if total_size <= self.max_size:
+                break
+            try:
+                entry_path.unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logging.warning(f"Failed to evict image cache entry '{entry_path}': {e}")
+                continue
+            total_size -= size
+
+        self._total_size = total_size
+
+    def _scan_entries(self):
+        for entry_path in self.directory.glob(f"*/*{_CACHE_FILE_SUFFIX}"):
+            try:
+                stat = entry_path.stat()
+            except FileNotFoundError:
+                continue
+            yield entry_path, stat.st_size, stat.st_mtime
+
+    def _entry_path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}{_CACHE_FILE_SUFFIX}"
+
+    @staticmethod
+    def _hash_file(path: Path) -> str:
+        file_hash = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b""):
+                file_hash.update(chunk)
+        return file_hash.hexdigest()
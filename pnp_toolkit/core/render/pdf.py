@@ -1,64 +1,499 @@
+import json
 import logging
+import multiprocessing
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Executor, Future
+from dataclasses import dataclass, asdict
 from io import BytesIO
 from pathlib import Path
+from typing import Dict, Optional, Tuple, BinaryIO, List, Deque
 
-from PIL.Image import Image as PILImage
-from reportlab.lib.utils import ImageReader
-from reportlab.lib.units import mm
+from PIL import Image
+from reportlab.lib.units import mm, inch
+from reportlab.pdfbase.pdfdoc import PDFImageXObject
 from reportlab.pdfgen import canvas as report_canvas
 from reportlab.pdfgen.canvas import Canvas
 
-from pnp_toolkit.core.binpack.input_types import Position, Size
-from pnp_toolkit.core.binpack.output_types import PackedItemFront, PackedPage, PackedItemBack, PackedItem
+from pnp_toolkit.core.binpack.input_types import Size
+from pnp_toolkit.core.binpack.output_types import PackedPage, PackedItemRow, PACKED_ITEM_FRONT, PACKED_ITEM_BACK
 from pnp_toolkit.core.render.base import OutputRenderer
-from pnp_toolkit.core.render.types import RenderDocumentFlow
+from pnp_toolkit.core.render.image_cache import ImageCache
+from pnp_toolkit.core.render.types import RenderDocumentFlow, ImageHandle
+from pnp_toolkit.core.metrics import DocumentMetrics, measure, count
+from pnp_toolkit.core.utils import MemoryBudget
+
+
+PixelSize = Tuple[int, int]
+
+IMAGE_ENCODINGS = ["png", "jpeg", "passthrough"]
+DEFAULT_JPEG_QUALITY = 90
+
+# pdf color spaces of image modes, which could be embedded without conversion
+_COLOR_SPACES = {"L": "DeviceGray", "RGB": "DeviceRGB", "CMYK": "DeviceCMYK"}
+# changed with layout of PDFImageStream, so entries of older layout are never read
+_CACHE_ENTRY_FORMAT = "pdf-stream-1"
+
+
+@dataclass(frozen=True)
+class ImageEncoding:
+    """
+    How images are embedded into the document:
+      png - lossless (flate compressed) pixel data
+      jpeg[:quality] - images without alpha channel are embedded as DCT compressed data
+      passthrough - untransformed JPEG sources are embedded byte-for-byte, others as png
+    """
+    name: str
+    quality: int = DEFAULT_JPEG_QUALITY
+
+    @classmethod
+    def parse(cls, raw: str) -> "ImageEncoding":
+        name, _, quality = str(raw).partition(":")
+        name = name.strip().lower()
+        if name not in IMAGE_ENCODINGS:
+            raise ValueError(f"Unsupported image encoding '{raw}'. Expected one of {IMAGE_ENCODINGS}")
+        if quality and name != "jpeg":
+            raise ValueError(f"Image encoding '{name}' doesn't support quality param")
+        return cls(name, int(quality) if quality else DEFAULT_JPEG_QUALITY)
+
+    def __str__(self) -> str:
+        if self.name == "jpeg":
+            return f"{self.name}:{self.quality}"
+        return self.name
+
+
+@dataclass
+class PDFImageStream:
+    """
+    Image compressed exactly as it is embedded into PDF (FlateDecode or DCTDecode),
+    so embedding requires neither decoding nor compression. Alpha channel, if any,
+    is kept as separate flate compressed soft mask.
+    """
+    width: int
+    height: int
+    color_space: str
+    filter: str
+    data: bytes
+    alpha: Optional[bytes] = None
+    decode: Optional[List[int]] = None
+
+    @property
+    def size(self) -> int:
+        return len(self.data) + len(self.alpha or b"")
+
+    def to_bytes(self) -> bytes:
+        header = asdict(self)
+        header["data"] = len(self.data)
+        header["alpha"] = len(self.alpha) if self.alpha is not None else None
+        return json.dumps(header).encode() + b"\n" + self.data + (self.alpha or b"")
+
+    @classmethod
+    def from_bytes(cls, raw: bytes) -> "PDFImageStream":
+        header, _, payload = raw.partition(b"\n")
+        params = json.loads(header)
+        data_size = params["data"]
+        params["data"] = payload[:data_size]
+        if params["alpha"] is not None:
+            params["alpha"] = payload[data_size:]
+        return cls(**params)
 
 
 class PDFOutputRenderer(OutputRenderer):
-    def __init__(self, output_path: Path):
+    """
+    Images are read by io executor and converted by cpu executor. Without executors
+    provided, renderer runs own pool of max_workers for both, otherwise shared pools
+    are used and max_workers only limits count of pages prepared ahead.
+
+    With memory budget provided, page is prepared only when estimated decoded size of
+    its new images fits the budget, otherwise already prepared pages are drawn first.
+    """
+
+    def __init__(self, output_path: Path, *, max_workers: Optional[int] = None,
+                 image_cache: Optional[ImageCache] = None, dpi: Optional[float] = None, encoding: str = "png",
+                 io_executor: Optional[Executor] = None, cpu_executor: Optional[Executor] = None,
+                 memory_budget: Optional[MemoryBudget] = None, metrics: Optional[DocumentMetrics] = None):
+        if not max_workers:
+            max_workers = multiprocessing.cpu_count()
         self.output_path = output_path
+        self.max_workers = max_workers
+        self.io_executor = io_executor
+        self.cpu_executor = cpu_executor
+        self.memory_budget = memory_budget or MemoryBudget()
+        self.metrics = metrics
+        self.image_cache = image_cache
+        # images with higher resolution are downsampled to this dpi before embedding
+        self.dpi = dpi
+        self.encoding = ImageEncoding.parse(encoding)
 
     def render(self, render_flow: RenderDocumentFlow):
         self.output_path.parent.mkdir(exist_ok=True, parents=True)
 
-        packed_document = render_flow.packed_document
-
         canvas = report_canvas.Canvas(self.output_path.as_posix())
 
-        for page in packed_document.pages:
+        with ThreadPoolExecutor(max_workers=self.max_workers) as own_executor:
+            image_resources = PDFImageResources(
+                canvas, self.io_executor or own_executor, self.cpu_executor or own_executor,
+                self.image_cache, self.dpi, self.encoding, self.metrics,
+            )
+            # images are prepared in workers for a few pages ahead,
+            # canvas itself is filled strictly in page order
+            lookahead = self.max_workers
+            prefetched_pages = deque()  # type: Deque[Tuple[PackedPage, int]]
+
+            try:
+                for page in render_flow.pages:
+                    page_images = self._get_page_images(page, render_flow)
+                    page_memory = image_resources.estimate_memory(page_images, render_flow.decoded_sizes)
+                    # waiting for budget only with nothing prepared, prepared pages hold budget themselves
+                    while not self.memory_budget.acquire(page_memory, block=not prefetched_pages):
+                        self._draw_prefetched_page(canvas, image_resources, prefetched_pages, render_flow)
+
+                    for image, size in page_images:
+                        image_resources.prefetch(image, size)
+                    prefetched_pages.append((page, page_memory))
+                    if len(prefetched_pages) > lookahead:
+                        self._draw_prefetched_page(canvas, image_resources, prefetched_pages, render_flow)
+
+                while prefetched_pages:
+                    self._draw_prefetched_page(canvas, image_resources, prefetched_pages, render_flow)
+            finally:
+                for _, page_memory in prefetched_pages:
+                    self.memory_budget.release(page_memory)
+
+        with measure(self.metrics, "write"):
+            canvas.save()
+        count(self.metrics, "bytes_written", self.output_path.stat().st_size)
+
+    def _draw_prefetched_page(self, canvas: Canvas, image_resources: "PDFImageResources",
+                              prefetched_pages: "Deque[Tuple[PackedPage, int]]", render_flow: RenderDocumentFlow):
+        page, page_memory = prefetched_pages[0]
+        self._draw_page(canvas, image_resources, page, render_flow)
+        # images of the page are embedded and their pixel data are released
+        prefetched_pages.popleft()
+        self.memory_budget.release(page_memory)
+
+    def _draw_page(self, canvas: Canvas, image_resources: "PDFImageResources", page: PackedPage,
+                   render_flow: RenderDocumentFlow):
+        # images are waited for before drawing, so write time is spent by canvas only
+        with measure(self.metrics, "wait"):
+            image_resources.wait(self._get_page_images(page, render_flow))
+
+        with measure(self.metrics, "write"):
             canvas.setPageSize((page.size.width * mm, page.size.height * mm))
 
-            for item in page.items:
-                self._draw_item(canvas, item, page, render_flow)
+            for item in page.columns.rows():
+                self._draw_item(canvas, image_resources, item, page, render_flow)
 
             canvas.showPage()
 
-        canvas.save()
+    def _get_page_images(self, page: PackedPage, render_flow: RenderDocumentFlow) -> List[Tuple[ImageHandle, Size]]:
+        page_images = []
+        for item in page.columns.rows():
+            item_image = self._get_item_image(item, render_flow)
+            if item_image is not None:
+                page_images.append((item_image, self._get_item_image_size(item)))
+        return page_images
 
-    def _draw_item(self, canvas: Canvas, item: PackedItem, page: PackedPage, render_flow: RenderDocumentFlow):
-        if isinstance(item, PackedItemFront):
-            item_id = item.id
-            item_image = render_flow.front_images[item_id]
-        elif isinstance(item, PackedItemBack):
-            item_id = item.id
-            item_image = render_flow.back_images[item_id]
-        else:
-            logging.warning(f"Unsupported packed item type! Provided {type(item)}")
+    def _draw_item(self, canvas: Canvas, image_resources: "PDFImageResources", item: PackedItemRow,
+                   page: PackedPage, render_flow: RenderDocumentFlow):
+        item_image = self._get_item_image(item, render_flow)
+        if item_image is None:
+            logging.warning(f"Unsupported packed item kind! Provided {item.kind}")
             return
 
-        self._draw_image(canvas, page.size, item.position, item.size, item_image)
+        form_name = image_resources.form_name(item_image, self._get_item_image_size(item))
+        self._draw_form(canvas, page.size, item, form_name)
 
     @staticmethod
-    def _draw_image(canvas: Canvas, page_size: Size, position: Position, size: Size, image: PILImage):
-        image_buffer = BytesIO()
-        image.save(image_buffer, "PNG")
-        image_buffer.seek(0)
-
-        canvas.drawImage(
-            ImageReader(image_buffer),
-            position.x*mm,
-            (page_size.height - position.y - size.height)*mm,  # fix coordinate system
-            size.width*mm,
-            size.height*mm,
-            mask="auto",
+    def _get_item_image(item: PackedItemRow, render_flow: RenderDocumentFlow) -> Optional[ImageHandle]:
+        if item.kind == PACKED_ITEM_FRONT:
+            return render_flow.front_images[item.id]
+        if item.kind == PACKED_ITEM_BACK:
+            return render_flow.back_images[item.id]
+        return None
+
+    @staticmethod
+    def _get_item_image_size(item: PackedItemRow) -> Size:
+        if item.rotated:
+            return Size(item.height, item.width)
+        return Size(item.width, item.height)
+
+    @staticmethod
+    def _draw_form(canvas: Canvas, page_size: Size, item: PackedItemRow, form_name: str):
+        canvas.saveState()
+        canvas.translate(
+            item.x*mm,
+            (page_size.height - item.y - item.height)*mm,  # fix coordinate system
+        )
+        if item.rotated < 0:
+            canvas.translate(0, item.height*mm)
+            canvas.rotate(-90)
+            canvas.scale(item.height*mm, item.width*mm)
+        elif item.rotated > 0:
+            canvas.translate(item.width*mm, 0)
+            canvas.rotate(90)
+            canvas.scale(item.height*mm, item.width*mm)
+        else:
+            canvas.scale(item.width*mm, item.height*mm)
+        canvas.doForm(form_name)
+        canvas.restoreState()
+
+
+class PDFImageResources:
+    """
+    Embeds every distinct image into the document only once.
+
+    Sources are read by io executor workers and decoded and compressed to image streams
+    by cpu executor workers (prefetch call), canvas thread only embeds prepared stream
+    on first use as unit-sized image XObject, all placements reference it with own
+    position and scale. Prepared stream is released right after embedding, so memory
+    usage doesn't grow with count of images in the document.
+
+    With dpi provided, images are downsampled in workers to exact pixel size required
+    by placement size, so same image placed with different sizes is embedded per size.
+
+    With image cache provided, prepared streams are stored in the cache and following
+    builds embed them as is, skipping source decoding, transformations and compression.
+    """
+
+    def __init__(self, canvas: Canvas, io_executor: Executor, cpu_executor: Executor,
+                 image_cache: Optional[ImageCache] = None, dpi: Optional[float] = None,
+                 encoding: ImageEncoding = ImageEncoding("png"), metrics: Optional[DocumentMetrics] = None):
+        self._canvas = canvas
+        self._io_executor = io_executor
+        self._cpu_executor = cpu_executor
+        self._image_cache = image_cache
+        self._dpi = dpi
+        self._encoding = encoding
+        self._metrics = metrics
+        self._form_names = {}  # type: Dict[Tuple[ImageHandle, Optional[PixelSize]], str]
+        self._pending = {}  # type: Dict[Tuple[ImageHandle, Optional[PixelSize]], Future]
+
+    def prefetch(self, image: ImageHandle, size: Size):
+        resource_key = (image, self._target_pixel_size(size))
+        if resource_key in self._form_names or resource_key in self._pending:
+            return
+        self._pending[resource_key] = _submit_chain(
+            self._io_executor, self._read_image,
+            self._cpu_executor, self._prepare_image,
+            *resource_key,
+        )
+
+    def estimate_memory(self, images: List[Tuple[ImageHandle, Size]], decoded_sizes: Dict[Path, int]) -> int:
+        """ Estimated decoded size of images which are neither embedded nor prefetched yet """
+        new_resources = {
+            (image, self._target_pixel_size(size)) for image, size in images
+        }.difference(self._form_names, self._pending)
+        return sum(decoded_sizes.get(image.path, 0) for image, _ in new_resources)
+
+    def wait(self, images: List[Tuple[ImageHandle, Size]]):
+        for image, size in images:
+            pending = self._pending.get((image, self._target_pixel_size(size)))
+            if pending is not None:
+                pending.result()
+
+    def form_name(self, image: ImageHandle, size: Size) -> str:
+        resource_key = (image, self._target_pixel_size(size))
+        form_name = self._form_names.get(resource_key)
+        if form_name is not None:
+            return form_name
+
+        self.prefetch(image, size)
+        image_stream = self._pending.pop(resource_key).result()
+
+        form_name = f"pnp_image_{len(self._form_names)}"
+        _embed_image_stream(self._canvas, form_name, image_stream)
+
+        self._form_names[resource_key] = form_name
+        return form_name
+
+    def _target_pixel_size(self, size: Size) -> Optional[PixelSize]:
+        if not self._dpi:
+            return None
+        return (
+            max(1, round(size.width * mm / inch * self._dpi)),
+            max(1, round(size.height * mm / inch * self._dpi)),
         )
+
+    def _read_image(self, image: ImageHandle, pixel_size: Optional[PixelSize]) -> "_ReadImage":
+        with measure(self._metrics, "read"):
+            read_image = self._read_image_source(image, pixel_size)
+        count(self._metrics, "bytes_read", read_image.size)
+        return read_image
+
+    def _read_image_source(self, image: ImageHandle, pixel_size: Optional[PixelSize]) -> "_ReadImage":
+        source = None
+        if self._encoding.name == "passthrough":
+            source = image.path.read_bytes()
+            if self._is_passthrough_possible(image, pixel_size, source):
+                # original jpeg data is embedded as is, it is never decoded
+                return _ReadImage(stream=_jpeg_stream(source))
+
+        if self._image_cache is None:
+            return _ReadImage(source=source or image.path.read_bytes())
+
+        cache_key_params = {
+            "encoding": str(self._encoding) if self._encoding.name == "jpeg" else "png",
+            "format": _CACHE_ENTRY_FORMAT,
+        }
+        if pixel_size:
+            cache_key_params["size"] = f"{pixel_size[0]}x{pixel_size[1]}"
+        cache_key = self._image_cache.make_key(image, **cache_key_params)
+
+        cached_stream = self._image_cache.get(cache_key)
+        count(self._metrics, "image_cache_hits" if cached_stream is not None else "image_cache_misses")
+        if cached_stream is not None:
+            return _ReadImage(stream=PDFImageStream.from_bytes(cached_stream))
+        return _ReadImage(source=source or image.path.read_bytes(), cache_key=cache_key)
+
+    def _prepare_image(self, read_image: "_ReadImage", image: ImageHandle,
+                       pixel_size: Optional[PixelSize]) -> PDFImageStream:
+        if read_image.stream is not None:
+            return read_image.stream
+
+        count(self._metrics, "images_decoded")
+        with measure(self._metrics, "decode"):
+            pil_image = self._load_image(image, pixel_size, BytesIO(read_image.source))
+
+        with measure(self._metrics, "encode"):
+            image_stream = self._encode_image(pil_image)
+
+        if read_image.cache_key is not None:
+            self._image_cache.put(read_image.cache_key, image_stream.to_bytes())
+        return image_stream
+
+    @staticmethod
+    def _is_passthrough_possible(image: ImageHandle, pixel_size: Optional[PixelSize], source: bytes) -> bool:
+        if image.mirror_vertical or image.mirror_horizontal:
+            return False
+
+        # only header is parsed here, pixel data stay untouched
+        with Image.open(BytesIO(source)) as orig:
+            if orig.format != "JPEG" or orig.mode not in _COLOR_SPACES:
+                return False
+            if pixel_size and orig.width * orig.height > pixel_size[0] * pixel_size[1]:
+                return False
+
+        return True
+
+    @staticmethod
+    def _load_image(image: ImageHandle, pixel_size: Optional[PixelSize], source: BinaryIO) -> Image.Image:
+        pil_image = _normalize_image_mode(image.load(draft_size=pixel_size, source=source))
+
+        # only downsample, upscaling doesn't add any details to printed image
+        if pixel_size and pil_image.width * pil_image.height > pixel_size[0] * pixel_size[1]:
+            pil_image = pil_image.resize(pixel_size, Image.LANCZOS)
+
+        return pil_image
+
+    def _encode_image(self, image: Image.Image) -> PDFImageStream:
+        # jpeg doesn't support alpha channel, such images always stay lossless
+        if self._encoding.name == "jpeg" and image.mode in _COLOR_SPACES:
+            image_buffer = BytesIO()
+            image.save(image_buffer, "JPEG", quality=self._encoding.quality)
+            return _jpeg_stream(image_buffer.getvalue())
+        return _flate_stream(image)
+
+
+@dataclass
+class _ReadImage:
+    """ Result of io stage: source file content, or image stream taken from cache """
+    source: Optional[bytes] = None
+    stream: Optional[PDFImageStream] = None
+    cache_key: Optional[str] = None
+
+    @property
+    def size(self) -> int:
+        return len(self.source or b"") + (self.stream.size if self.stream is not None else 0)
+
+
+def _submit_chain(first_executor: Executor, first_task, second_executor: Executor, second_task, *args) -> Future:
+    """
+    Runs first_task(*args) in first executor and then second_task(first_result, *args) in second one,
+    no worker of any executor is blocked waiting for the other.
+    """
+    result = Future()
+
+    def copy_result(second_future: Future):
+        error = second_future.exception()
+        if error is not None:
+            result.set_exception(error)
+        else:
+            result.set_result(second_future.result())
+
+    def submit_second(first_future: Future):
+        try:
+            second_executor.submit(second_task, first_future.result(), *args).add_done_callback(copy_result)
+        except BaseException as e:
+            result.set_exception(e)
+
+    first_executor.submit(first_task, *args).add_done_callback(submit_second)
+    return result
+
+
+def _flate_stream(image: Image.Image) -> PDFImageStream:
+    alpha = None
+    if image.mode in ("RGBA", "LA"):
+        alpha = image.getchannel("A")
+        image = image.convert(image.mode[:-1])
+        # fully opaque image doesn't need soft mask at all
+        if alpha.getextrema() == (255, 255):
+            alpha = None
+
+    return PDFImageStream(
+        width=image.width,
+        height=image.height,
+        color_space=_COLOR_SPACES[image.mode],
+        filter="FlateDecode",
+        data=zlib.compress(image.tobytes()),
+        alpha=zlib.compress(alpha.tobytes()) if alpha is not None else None,
+    )
+
+
+def _jpeg_stream(data: bytes) -> PDFImageStream:
+    # only header is read, compressed data is embedded untouched
+    with Image.open(BytesIO(data)) as header:
+        width, height, mode = header.width, header.height, header.mode
+        # adobe applications (and pillow) store cmyk inverted and mark it with APP14 "Adobe" segment
+        inverted = mode == "CMYK" and "adobe" in header.info
+    return PDFImageStream(
+        width=width,
+        height=height,
+        color_space=_COLOR_SPACES[mode],
+        filter="DCTDecode",
+        data=data,
+        decode=[1, 0] * 4 if inverted else None,
+    )
+
+
+def _embed_image_stream(canvas: Canvas, name: str, image_stream: PDFImageStream):
+    """ Adds image XObject drawn by canvas.doForm(name) into unit square, same as unit-sized form """
+    document = canvas._doc
+
+    def make_xobject(xobject_name: str, color_space: str, data: bytes, filter_name: str) -> PDFImageXObject:
+        xobject = PDFImageXObject(xobject_name)
+        xobject.width = image_stream.width
+        xobject.height = image_stream.height
+        xobject.bitsPerComponent = 8
+        xobject.colorSpace = color_space
+        xobject._filters = (filter_name,)
+        xobject.streamContent = data
+        xobject.mask = None
+        return xobject
+
+    image_xobject = make_xobject(name, image_stream.color_space, image_stream.data, image_stream.filter)
+    if image_stream.decode:
+        image_xobject._decode = image_stream.decode
+    if image_stream.alpha is not None:
+        alpha_name = f"{name}_alpha"
+        alpha_xobject = make_xobject(alpha_name, "DeviceGray", image_stream.alpha, "FlateDecode")
+        image_xobject.smask = document.Reference(alpha_xobject, document.getXObjectName(alpha_name))
+    document.addForm(name, image_xobject)
+
+
+def _normalize_image_mode(image: Image.Image) -> Image.Image:
+    if image.mode in ("RGB", "RGBA", "L", "LA", "CMYK"):
+        return image
+    if image.mode == "PA" or (image.mode == "P" and "transparency" in image.info):
+        return image.convert("RGBA")
+    return image.convert("RGB")
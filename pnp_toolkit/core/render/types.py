@@ -1,14 +1,47 @@
 from dataclasses import dataclass, field
-from typing import Dict
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Iterable, BinaryIO
 
-from PIL.Image import Image
+from PIL import Image, ImageOps
 
-from pnp_toolkit.core.binpack.output_types import PackedDocument
+from pnp_toolkit.core.binpack.output_types import PackedPage
+
+
+@dataclass(frozen=True)
+class ImageHandle:
+    """
+    Lazy reference to source image with transformations which should be applied on it.
+    Pixels are decoded only by load call, so caller decide how long image stay in memory.
+    Handles with same path and transformations are equal and can share rendered resources.
+    """
+    path: Path
+    mirror_vertical: bool = False
+    mirror_horizontal: bool = False
+
+    def load(self, draft_size: Optional[Tuple[int, int]] = None, source: Optional[BinaryIO] = None) -> Image.Image:
+        """
+        Decode image. With draft_size provided, decoder allowed to return reduced image
+        (not smaller than draft_size), which is much faster for big JPEG sources.
+        With source provided, already read content of file is decoded instead of the path.
+        """
+        with Image.open(source if source is not None else self.path) as orig:
+            if draft_size:
+                orig.draft(orig.mode, draft_size)
+            image = orig.copy()
+
+        if self.mirror_vertical:
+            image = ImageOps.flip(image)
+        if self.mirror_horizontal:
+            image = ImageOps.mirror(image)
+
+        return image
 
 
 @dataclass
 class RenderDocumentFlow:
-    packed_document: PackedDocument
-    front_images: Dict[int, Image]
-    back_images: Dict[int, Image]
-
+    # pages could be produced lazily, renderer consumes them in order only once
+    pages: Iterable[PackedPage]
+    front_images: Dict[int, ImageHandle]
+    back_images: Dict[int, ImageHandle]
+    # estimated size of decoded pixel data by image path, used by memory budget
+    decoded_sizes: Dict[Path, int] = field(default_factory=dict)
@@ -1,9 +1,9 @@
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Tuple, List
+from typing import Tuple, List, Optional
 
 from pnp_toolkit.core.measures import DistanceMeasure2D
-from pnp_toolkit.core.utils import resolve_glob_pathes, path_combinations
+from pnp_toolkit.core.utils import resolve_glob_pathes, path_combinations, DirectoryScanCache
 
 
 @dataclass
@@ -78,8 +78,8 @@ class BackImageSpecification:
 class MultiGlob:
     glob_path: List[str]
 
-    def resolve(self) -> List[Path]:
-        return [Path(p) for p in resolve_glob_pathes(self.glob_path)]
+    def resolve(self, scan_cache: Optional[DirectoryScanCache] = None) -> List[Path]:
+        return [Path(p) for p in resolve_glob_pathes(self.glob_path, scan_cache)]
 
     def combine(self, other: "MultiGlob") -> "MultiGlob":
-        return MultiGlob(path_combinations(self.glob_path, other.glob_path))
+        return MultiGlob(list(path_combinations(self.glob_path, other.glob_path)))
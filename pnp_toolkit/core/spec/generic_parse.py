@@ -111,6 +111,12 @@ def _get_builtin_pack_strategies():
             name="roll_guillotine",
             params={},
         ),
+        "search": PackStrategySpecification(
+            name="search",
+            params={
+                "rotation": True,
+            },
+        ),
     }
 
 
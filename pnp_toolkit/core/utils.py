@@ -1,6 +1,8 @@
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
-from glob import glob
 from collections import OrderedDict
+from fnmatch import fnmatch
+from glob import has_magic
 import pnp_toolkit
 import tempfile
 import shutil
@@ -9,6 +11,7 @@ import pathlib
 import typing
 import itertools
 import re
+import threading
 
 
 def chunks(seq: typing.List[typing.Any], n: int):
@@ -45,11 +48,135 @@ def path_combinations(first_pathes, second_pathes):
         yield join_pathes(first_path, second_path)
 
 
-def resolve_glob_pathes(glob_pathes):
-    result_pathes = []
+class DirectoryScanCache:
+    """
+    Listings of directories scanned during single build. Every directory is read only once,
+    no matter how many glob patterns look into it. Directories of the same depth
+    are scanned in parallel, which matters mostly for network mounted trees.
+    """
+
+    def __init__(self, max_workers: typing.Optional[int] = None):
+        self.max_workers = max_workers
+        self._listings = {}  # type: typing.Dict[str, typing.Optional[typing.Dict[str, bool]]]
+        self._lock = threading.Lock()
+
+    def scan(self, directory: str) -> typing.Optional[typing.Dict[str, bool]]:
+        """
+        Returns names of directory entries mapped to flag whether entry is directory,
+        or None if directory can't be read
+        """
+        with self._lock:
+            if directory in self._listings:
+                return self._listings[directory]
+
+        listing = {}
+        try:
+            with os.scandir(directory or os.curdir) as entries:
+                for entry in entries:
+                    listing[entry.name] = _is_dir_entry(entry)
+        except OSError:
+            # missing directory or not a directory at all, nothing is matched inside
+            listing = None
+
+        with self._lock:
+            return self._listings.setdefault(directory, listing)
+
+    def scan_many(self, directories: typing.Iterable[str]):
+        with self._lock:
+            not_scanned = [directory for directory in directories if directory not in self._listings]
+
+        if len(not_scanned) > 1:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                list(executor.map(self.scan, not_scanned))
+        else:
+            for directory in not_scanned:
+                self.scan(directory)
+
+
+def resolve_glob_pathes(glob_pathes, scan_cache: typing.Optional[DirectoryScanCache] = None) -> typing.List[str]:
+    """
+    Resolves all glob patterns at once with matching rules of `glob.glob`. Tree is walked
+    level by level and each directory is scanned once for all patterns looking into it.
+    Result is deduplicated and sorted.
+    """
+    scan_cache = scan_cache or DirectoryScanCache()
+
+    result_pathes = set()
+    # directory -> remaining parts of patterns to match inside of it
+    pending = {}  # type: typing.Dict[str, typing.List[typing.Tuple[typing.Tuple[str, ...], bool]]]
     for glob_path in glob_pathes:
-        result_pathes.extend(glob(glob_path))
-    return list(set(result_pathes))
+        directory, parts, dirs_only = _split_glob_path(glob_path)
+        if not parts:
+            # nothing to match, path is taken as is when it exists
+            if os.path.isdir(directory) if dirs_only else os.path.lexists(directory):
+                result_pathes.add(glob_path)
+            continue
+        pending.setdefault(directory, []).append((parts, dirs_only))
+
+    while pending:
+        scan_cache.scan_many(pending.keys())
+
+        next_pending = {}
+        for directory, patterns in pending.items():
+            listing = scan_cache.scan(directory)
+            if listing is None:
+                continue
+            for parts, dirs_only in patterns:
+                part, rest_parts = parts[0], parts[1:]
+                for name in _match_names(listing, part):
+                    is_dir = listing.get(name, True)
+                    path = os.path.join(directory, name)
+                    if rest_parts:
+                        if is_dir:
+                            next_pending.setdefault(path, []).append((rest_parts, dirs_only))
+                    elif dirs_only:
+                        if is_dir:
+                            result_pathes.add(os.path.join(path, ""))
+                    else:
+                        result_pathes.add(path)
+        pending = next_pending
+
+    return sorted(result_pathes)
+
+
+def _split_glob_path(glob_path: str) -> typing.Tuple[str, typing.Tuple[str, ...], bool]:
+    """
+    Splits pattern into directory without magic, kept as written (same as glob keeps it,
+    repeated separators included), and parts to match inside of it.
+    """
+    separators = os.sep + (os.altsep or "")
+    stripped_path = glob_path.rstrip(separators)
+    if not stripped_path:
+        return glob_path, (), True
+
+    parts = []
+    directory = stripped_path
+    while has_magic(directory):
+        directory, tail = os.path.split(directory)
+        parts.append(tail)
+
+    return directory, tuple(reversed(parts)), stripped_path != glob_path
+
+
+def _match_names(listing: typing.Dict[str, bool], part: str) -> typing.List[str]:
+    if not has_magic(part):
+        if part in (os.curdir, os.pardir) or part in listing:
+            return [part]
+        return []
+
+    # same as glob, hidden entries are matched only by pattern explicitly starting with dot
+    include_hidden = part.startswith(".")
+    return [
+        name for name in listing
+        if (include_hidden or not name.startswith(".")) and fnmatch(name, part)
+    ]
+
+
+def _is_dir_entry(entry: os.DirEntry) -> bool:
+    try:
+        return entry.is_dir()
+    except OSError:
+        return False
 
 
 def search_multiple_copies(image_pathes, multiple_copies):
@@ -63,3 +190,63 @@ def search_multiple_copies(image_pathes, multiple_copies):
             result[image_path] = 1
 
     return result
+
+
+_SIZE_UNITS = {
+    "b": 1,
+    "k": 1024, "kb": 1024,
+    "m": 1024 ** 2, "mb": 1024 ** 2,
+    "g": 1024 ** 3, "gb": 1024 ** 3,
+    "t": 1024 ** 4, "tb": 1024 ** 4,
+}
+
+
+def parse_size_bytes(size: typing.Union[str, int]) -> int:
+    match = re.fullmatch(r"\s*(?P<value>\d+(\.\d+)?)\s*(?P<unit>\w*)\s*", str(size))
+    if not match:
+        raise ValueError(f"Fail to parse size '{size}'. Expected number with optional unit, as example '512MB'")
+
+    unit = (match["unit"] or "b").lower()
+    if unit not in _SIZE_UNITS:
+        raise ValueError(f"Fail to parse size '{size}'. Unsupported unit '{match['unit']}'")
+
+    return int(float(match["value"]) * _SIZE_UNITS[unit])
+
+
+class MemoryBudget:
+    """
+    Memory shared by concurrent work, as example decoded images of all documents built at once.
+    Work is admitted only while total of acquired amounts stays within limit, amount bigger
+    than whole limit is admitted alone. Without limit everything is admitted immediately.
+    """
+
+    def __init__(self, limit: typing.Optional[int] = None):
+        self.limit = limit
+        self._used = 0
+        self._condition = threading.Condition()
+
+    @property
+    def used(self) -> int:
+        return self._used
+
+    def acquire(self, amount: int, block: bool = True) -> bool:
+        """ Returns False if amount can't be admitted without blocking, acquired amount should be released later """
+        if self.limit is None:
+            return True
+
+        amount = min(amount, self.limit)
+        with self._condition:
+            while self._used + amount > self.limit:
+                if not block:
+                    return False
+                self._condition.wait()
+            self._used += amount
+        return True
+
+    def release(self, amount: int):
+        if self.limit is None or amount <= 0:
+            return
+
+        with self._condition:
+            self._used -= min(amount, self.limit)
+            self._condition.notify_all()
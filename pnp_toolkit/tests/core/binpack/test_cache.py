@@ -0,0 +1,106 @@
+from pathlib import Path
+from typing import List, Iterator
+
+from pnp_toolkit.core.binpack.cache import PackCache, CachedPackStrategy
+from pnp_toolkit.core.binpack.input_types import SimplePaperSpec, Size, Padding, UnpackedItem, PaperSpec
+from pnp_toolkit.core.binpack.output_types import PackedDocument, PackedItemBack, PackedPage
+from pnp_toolkit.core.binpack.strategy.simple_guillotine import SimpleGuillotinePackStrategy
+
+
+class CountingPackStrategy(SimpleGuillotinePackStrategy):
+    # counter is kept outside of instance, strategy attributes are part of cache key
+    pack_calls = []
+
+    def pack_iter(self, paper_spec: PaperSpec, components: List[UnpackedItem]) -> Iterator[PackedPage]:
+        self.pack_calls.append(len(components))
+        return super().pack_iter(paper_spec, components)
+
+    @property
+    def pack_count(self) -> int:
+        return len(self.pack_calls)
+
+
+PAPER_SPEC = SimplePaperSpec(size=Size(210, 297), padding=Padding(5, 5, 5, 5))
+
+
+def _make_items(first_id: int) -> List[UnpackedItem]:
+    sizes = [Size(63, 88.5)] * 12 + [Size(40, 40)] * 5
+    return [UnpackedItem(first_id + idx, size, back_exists=idx % 2 == 0) for idx, size in enumerate(sizes)]
+
+
+def _layout(document: PackedDocument):
+    return [
+        [(type(item), item.id, item.position, item.size, item.rotated) for item in page.items]
+        for page in document.pages
+    ]
+
+
+def test_cached_pack_strategy_remaps_item_ids():
+    strategy = CountingPackStrategy()
+    strategy.pack_calls.clear()
+    cached_strategy = CachedPackStrategy(strategy, PackCache())
+
+    first_document = cached_strategy.pack(PAPER_SPEC, _make_items(first_id=0))
+    second_document = cached_strategy.pack(PAPER_SPEC, _make_items(first_id=100))
+
+    assert strategy.pack_count == 1
+    assert _layout(first_document) == _layout(SimpleGuillotinePackStrategy().pack(PAPER_SPEC, _make_items(0)))
+    assert _layout(second_document) == _layout(SimpleGuillotinePackStrategy().pack(PAPER_SPEC, _make_items(100)))
+    assert any(isinstance(item, PackedItemBack) for page in second_document.pages for item in page.items)
+
+
+def test_cached_pack_strategy_misses_on_changed_input():
+    strategy = CountingPackStrategy()
+    strategy.pack_calls.clear()
+    cached_strategy = CachedPackStrategy(strategy, PackCache())
+    items = _make_items(first_id=0)
+
+    cached_strategy.pack(PAPER_SPEC, items)
+    cached_strategy.pack(SimplePaperSpec(size=Size(297, 210), padding=Padding(5, 5, 5, 5)), items)
+    cached_strategy.pack(PAPER_SPEC, items[:-1])
+    cached_strategy.pack(PAPER_SPEC, [UnpackedItem(item.id, item.size, not item.back_exists) for item in items])
+
+    assert strategy.pack_count == 4
+
+
+def test_pack_cache_persists_on_disk(tmp_path: Path):
+    strategy = CountingPackStrategy()
+    strategy.pack_calls.clear()
+    document = CachedPackStrategy(strategy, PackCache(tmp_path)).pack(PAPER_SPEC, _make_items(first_id=0))
+    cached_document = CachedPackStrategy(strategy, PackCache(tmp_path)).pack(PAPER_SPEC, _make_items(first_id=0))
+
+    assert strategy.pack_count == 1
+    assert _layout(cached_document) == _layout(document)
+
+
+def test_pack_cache_evicts_least_recently_used():
+    cache = PackCache(max_entries=2)
+    documents = [PackedDocument(pages=[]) for _ in range(3)]
+
+    cache.put("first", documents[0])
+    cache.put("second", documents[1])
+    assert cache.get("first") is documents[0]
+    cache.put("third", documents[2])
+
+    assert cache.get("first") is documents[0]
+    assert cache.get("second") is None
+    assert cache.get("third") is documents[2]
+
+
+def test_cached_pack_strategy_stores_document_after_iteration():
+    strategy = CountingPackStrategy()
+    strategy.pack_calls.clear()
+    cache = PackCache()
+    cached_strategy = CachedPackStrategy(strategy, cache)
+    items = _make_items(first_id=0)
+    key = cache.make_key(PAPER_SPEC, strategy, [UnpackedItem(slot, item.size, item.back_exists)
+                                                for slot, item in enumerate(items)])
+
+    pages = cached_strategy.pack_iter(PAPER_SPEC, items)
+    first_page = next(pages)
+    assert cache.get(key) is None
+
+    rest_pages = list(pages)
+    assert cache.get(key) is not None
+    assert [first_page] + rest_pages == cached_strategy.pack(PAPER_SPEC, items).pages
+    assert strategy.pack_count == 1
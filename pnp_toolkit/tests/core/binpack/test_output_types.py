@@ -0,0 +1,32 @@
+from pnp_toolkit.core.binpack.input_types import Size, Position
+from pnp_toolkit.core.binpack.output_types import PackedItemColumns, PackedItemFront, PackedItemBack, PackedPage, \
+    PACKED_ITEM_FRONT, PACKED_ITEM_BACK
+
+
+def test_packed_item_columns_items_view():
+    items = [
+        PackedItemFront(position=Position(5, 10), size=Size(63, 88.5), id=3),
+        PackedItemBack(position=Position(70, 10), size=Size(88.5, 63), id=7, rotated=True),
+    ]
+
+    columns = PackedItemColumns.from_items(items)
+
+    assert len(columns) == 2
+    assert list(columns.kinds) == [PACKED_ITEM_FRONT, PACKED_ITEM_BACK]
+    assert list(columns.ids) == [3, 7]
+    assert columns.to_items() == items
+    assert PackedPage(Size(210, 297), items) == PackedPage(Size(210, 297), columns=columns)
+
+
+def test_packed_item_columns_copy_and_translate():
+    columns = PackedItemColumns()
+    columns.append(PACKED_ITEM_FRONT, 0, 0, 0, 10, 20)
+    columns.append(PACKED_ITEM_FRONT, 1, 10, 0, 10, 20, rotated=True)
+
+    translated = columns.translated(5, 7)
+    remapped = columns.copy(ids=[10, 11])
+
+    assert [(row.x, row.y) for row in translated.rows()] == [(5, 7), (15, 7)]
+    assert list(remapped.ids) == [10, 11]
+    assert [row.rotated for row in remapped.rows()] == [False, True]
+    assert list(columns.ids) == [0, 1] and list(columns.xs) == [0, 10]
@@ -1,11 +1,13 @@
 import itertools
+import random
 from typing import List
 
 import pytest
 
 from pnp_toolkit.core.binpack.input_types import SimplePaperSpec, Size, Padding, UnpackedItem, Position, RollPaperSpec
 from pnp_toolkit.core.binpack.output_types import PackedDocument, PackedItemFront, PackedItemBack
-from pnp_toolkit.core.binpack.strategy.roll_guillotine import RollGuillotinePackStrategy
+from pnp_toolkit.core.binpack.strategy.roll_guillotine import RollGuillotinePackStrategy, phsppog, Rectangle, \
+    recursive_packing, _RemainingRectangles
 from pnp_toolkit.core.binpack.strategy.simple_guillotine import SimpleGuillotinePackStrategy
 from pnp_toolkit.tests.core.binpack.utils import assert_packed_intersections
 
@@ -48,3 +50,85 @@ def test_simple_guillotine_pack(
     assert len(packed_document.pages) == 1
     assert_packed_intersections(packed_document)
 
+
+
+def test_phsppog_deep_packing():
+    # tall rect leaves narrow column filled by thousands of thin rects one over another,
+    # such packing chain is deeper than default recursion limit
+    rectangles = [[50, 3000]] + [[50, 1] for _ in range(3000)]
+
+    height, placed_rectangles = phsppog(100, rectangles)
+
+    assert height == 3000
+    assert len(placed_rectangles) == len(rectangles)
+
+
+@pytest.mark.parametrize("sorting", ["width", "height"])
+def test_roll_guillotine_pack_with_rotation(sorting: str):
+    paper_spec = RollPaperSpec(width=100, padding=Padding(0, 0, 0, 0))
+    unpacked_items = [UnpackedItem(i, Size(90, 40)) for i in range(4)]
+    pack_strategy = RollGuillotinePackStrategy(rotation=True, sorting=sorting)
+
+    packed_document = pack_strategy.pack(paper_spec, unpacked_items)
+
+    items = packed_document.pages[0].items
+    assert len(items) == 4
+    assert all(item.rotated == (item.size == Size(40, 90)) for item in items)
+    assert_packed_intersections(packed_document)
+
+
+def _scan_best(rectangles, order, w, h, D):
+    """ Reference lookup: first rectangle in sorted order with the best priority """
+    best = (6, None, None)
+    for idx in order:
+        for j in range(D + 1):
+            item_w, item_h = rectangles[idx] if j == 0 else rectangles[idx][::-1]
+            if item_w == w and item_h == h:
+                priority = 1
+            elif item_w == w and item_h < h:
+                priority = 2
+            elif item_w < w and item_h == h:
+                priority = 3
+            elif item_w < w and item_h < h:
+                priority = 4
+            else:
+                priority = 5
+            if priority < best[0]:
+                best = (priority, j, idx)
+    return best
+
+
+@pytest.mark.parametrize("D", [0, 1])
+def test_remaining_rectangles_find_best(D: int):
+    rng = random.Random(D)
+    rectangles = [(rng.choice([10, 20, 30, 40]), rng.choice([10, 20, 30, 40, 50])) for _ in range(200)]
+    order = sorted(range(len(rectangles)), key=lambda idx: -rectangles[idx][0])
+    candidates = _RemainingRectangles(rectangles, list(order))
+
+    while order:
+        w, h = rng.choice([10, 20, 30, 40, 50, 60]), rng.choice([10, 20, 30, 40, 50, 60])
+        expected = _scan_best(rectangles, order, w, h, D)
+        priority, orientation, idx = candidates.find_best(w, h, D)
+        if expected[0] < 5:
+            assert (priority, orientation, idx) == expected
+        else:
+            assert priority >= 5
+            # only first rectangle of its size could be removed
+            size = rectangles[rng.choice(order)]
+            idx = next(i for i in order if rectangles[i] == size)
+
+        candidates.remove(idx)
+        order.remove(idx)
+        if order:
+            assert candidates.min_sides() == (min(rectangles[i][0] for i in order), min(rectangles[i][1] for i in order))
+
+
+def test_recursive_packing_compatibility():
+    rectangles = [[30, 40], [30, 20], [10, 10]]
+    result = [None] * len(rectangles)
+    indices = [0, 1, 2]
+
+    recursive_packing(0, 0, 30, 60, 0, rectangles, indices, result)
+
+    assert result[:2] == [Rectangle(0, 0, 30, 40), Rectangle(0, 40, 30, 20)]
+    assert indices == [2]
@@ -0,0 +1,109 @@
+import time
+
+from pnp_toolkit.core.binpack.input_types import SimplePaperSpec, Size, Padding, UnpackedItem, RollPaperSpec, \
+    Position
+from pnp_toolkit.core.binpack.output_types import PackedDocument, PackedPage, PackedItemFront, PackedItemBack
+from pnp_toolkit.core.binpack.strategy.roll_guillotine import RollGuillotinePackStrategy
+from pnp_toolkit.core.binpack.strategy.search import SearchPackStrategy, _paper_usage
+from pnp_toolkit.core.binpack.strategy.simple_guillotine import SimpleGuillotinePackStrategy
+from pnp_toolkit.core.pipeline.build import BuildPipeline
+from pnp_toolkit.core.spec.base import PackStrategySpecification
+from pnp_toolkit.core.spec.generic_parse import DEFAULT_PACK_STRATEGIES
+from pnp_toolkit.tests.core.binpack.utils import assert_packed_intersections
+
+
+def _make_items():
+    sizes = [Size(63, 88.5)] * 20 + [Size(120, 70)] * 6 + [Size(45, 25)] * 30 + [Size(25, 25)] * 15
+    return [UnpackedItem(idx, size) for idx, size in enumerate(sizes)]
+
+
+def test_search_pack_simple_paper():
+    paper_spec = SimplePaperSpec(size=Size(210, 297), padding=Padding(5, 5, 5, 5))
+    pack_strategy = SearchPackStrategy(rotation=True, time_budget=None, max_workers=2)
+
+    packed_document = pack_strategy.pack(paper_spec, _make_items())
+    default_document = SimpleGuillotinePackStrategy(rotation=True).pack(paper_spec, _make_items())
+
+    assert len(packed_document.pages) <= len(default_document.pages)
+    assert sorted(item.id for page in packed_document.pages for item in page.items) == list(range(71))
+    assert_packed_intersections(packed_document)
+
+
+def test_search_pack_roll_paper():
+    paper_spec = RollPaperSpec(width=210, padding=Padding(5, 5, 5, 5))
+    pack_strategy = SearchPackStrategy(rotation=True, time_budget=None, max_workers=2)
+
+    packed_document = pack_strategy.pack(paper_spec, _make_items())
+    default_document = RollGuillotinePackStrategy().pack(paper_spec, _make_items())
+
+    assert len(packed_document.pages) == 1
+    assert packed_document.pages[0].size.height <= default_document.pages[0].size.height
+    assert_packed_intersections(packed_document)
+
+
+def test_search_candidate_strategies():
+    pack_strategy = SearchPackStrategy(rotation=False)
+
+    simple_candidates = pack_strategy.candidate_strategies(SimplePaperSpec(Size(210, 297), Padding(0, 0, 0, 0)))
+    roll_candidates = pack_strategy.candidate_strategies(RollPaperSpec(210, Padding(0, 0, 0, 0)))
+
+    assert len(simple_candidates) == 35
+    assert not any(candidate.rotation for candidate in simple_candidates)
+    assert (simple_candidates[0].sorting, simple_candidates[0].split_heuristic) == ("area", "default")
+    assert len(roll_candidates) == 2
+
+
+class _SlowPackStrategy(SimpleGuillotinePackStrategy):
+    def __init__(self, marker_path, delay: float):
+        super().__init__()
+        self.marker_path = marker_path
+        self.delay = delay
+
+    def pack(self, paper_spec, items):
+        time.sleep(self.delay)
+        self.marker_path.write_text("finished")
+        return super().pack(paper_spec, items)
+
+
+class _SlowCandidatesSearchPackStrategy(SearchPackStrategy):
+    def __init__(self, marker_path, **kwargs):
+        super().__init__(**kwargs)
+        self.marker_path = marker_path
+
+    def candidate_strategies(self, paper_spec):
+        return [SimpleGuillotinePackStrategy(), _SlowPackStrategy(self.marker_path, delay=1.5)]
+
+
+def test_search_pack_stops_running_candidates_after_time_budget(tmp_path):
+    marker_path = tmp_path / "slow_candidate_finished"
+    paper_spec = SimplePaperSpec(size=Size(210, 297), padding=Padding(5, 5, 5, 5))
+    pack_strategy = _SlowCandidatesSearchPackStrategy(marker_path, time_budget=0.2, max_workers=2)
+
+    started_at = time.monotonic()
+    packed_document = pack_strategy.pack(paper_spec, _make_items())
+
+    assert time.monotonic() - started_at < 1.5
+    assert sorted(item.id for page in packed_document.pages for item in page.items) == list(range(71))
+
+    # slow candidate would have finished by now if its worker was left running
+    time.sleep(2)
+    assert not marker_path.exists()
+
+
+def test_search_paper_usage_ignores_back_pages():
+    front_page = PackedPage(Size(210, 297), [PackedItemFront(Position(0, 0), Size(63, 88), 0)])
+    back_page = PackedPage(Size(210, 297), [PackedItemBack(Position(0, 0), Size(63, 88), 0)])
+
+    with_backs = PackedDocument(pages=[front_page, back_page])
+    without_backs = PackedDocument(pages=[front_page])
+
+    assert _paper_usage(with_backs) == _paper_usage(without_backs) == 210 * 297
+
+
+def test_search_rotation_enabled_by_default():
+    builtin_strategy = BuildPipeline._convert_binpack_strategy(DEFAULT_PACK_STRATEGIES["search"], None)
+    custom_strategy = BuildPipeline._convert_binpack_strategy(PackStrategySpecification("search", {}), None)
+
+    assert builtin_strategy.rotation
+    assert custom_strategy.rotation
+    assert SearchPackStrategy().rotation
@@ -5,7 +5,8 @@ import pytest
 
 from pnp_toolkit.core.binpack.input_types import SimplePaperSpec, Size, Padding, UnpackedItem, Position
 from pnp_toolkit.core.binpack.output_types import PackedDocument, PackedItemFront, PackedItemBack
-from pnp_toolkit.core.binpack.strategy.simple_guillotine import SimpleGuillotinePackStrategy
+from pnp_toolkit.core.binpack.strategy.simple_guillotine import SimpleGuillotinePackStrategy, GuillotineBin, \
+    FreeRectangle, ITEM_SORTINGS, SPLIT_HEURISTICS
 from pnp_toolkit.tests.core.binpack.utils import assert_packed_intersections
 
 
@@ -52,4 +53,155 @@ def test_simple_guillotine_pack(
     assert_packed_intersections(packed_document)
 
 
+@pytest.mark.parametrize("rotation", [False, True])
+def test_guillotine_bin_find_best_score(rotation: bool):
+    guillotine_bin = GuillotineBin(Size(200, 287), rotation=rotation)
+    for idx, size in enumerate([Size(63, 88.5), Size(40, 40), Size(20, 120), Size(88.5, 63), Size(15, 30)]):
+        guillotine_bin.insert(UnpackedItem(idx, size))
 
+    for item_size in [Size(10, 10), Size(30, 15), Size(63, 88.5), Size(150, 150), Size(5, 130)]:
+        item = UnpackedItem(100, item_size)
+
+        expected_scores = []
+        for rect in guillotine_bin.freerects:
+            if GuillotineBin._item_fits_rect(item, rect):
+                expected_scores.append((GuillotineBin.scoreBAF(rect, item), rect, False))
+            if rotation and GuillotineBin._item_fits_rect(item, rect, rotation=True):
+                expected_scores.append((GuillotineBin.scoreBAF(rect, item), rect, True))
+        expected = min(expected_scores, key=lambda x: x[0]) if expected_scores else (None, None, False)
+
+        assert guillotine_bin._find_best_score(item) == expected
+
+
+def test_simple_guillotine_pack_rotated_items():
+    paper_spec = SimplePaperSpec(size=Size(65, 200), padding=Padding(0, 0, 0, 0))
+    unpacked_items = [UnpackedItem(i, Size(90, 60)) for i in range(3)]
+    pack_strategy = SimpleGuillotinePackStrategy(rotation=True)
+
+    packed_document = pack_strategy.pack(paper_spec, unpacked_items)
+
+    assert len(packed_document.pages) == 2
+    assert all(item.rotated and item.size == Size(60, 90) for page in packed_document.pages for item in page.items)
+    assert_packed_intersections(packed_document)
+
+
+def test_guillotine_bin_rectangle_merge():
+    guillotine_bin = GuillotineBin(Size(100, 100), rotation=False)
+    guillotine_bin._remove_freerect(FreeRectangle(100, 100, 0, 0))
+    for rect in [FreeRectangle(40, 30, 0, 0), FreeRectangle(40, 70, 0, 30), FreeRectangle(60, 100, 40, 0)]:
+        guillotine_bin._add_freerect(rect)
+
+    guillotine_bin.rectangle_merge()
+
+    assert list(guillotine_bin.freerects) == [FreeRectangle(100, 100, 0, 0)]
+
+
+def test_simple_guillotine_pack_mixed_items_with_rotation():
+    paper_spec = SimplePaperSpec(size=Size(210, 297), padding=Padding(5, 5, 5, 5))
+    sizes = [Size(63, 88.5), Size(88.5, 63), Size(120, 70), Size(45, 25), Size(25, 45), Size(70, 70), Size(15, 30)]
+    unpacked_items = [UnpackedItem(i, sizes[i * 5 % len(sizes)]) for i in range(120)]
+    pack_strategy = SimpleGuillotinePackStrategy(rotation=True)
+
+    packed_document = pack_strategy.pack(paper_spec, unpacked_items)
+
+    assert sorted(item.id for page in packed_document.pages for item in page.items) == list(range(120))
+    assert_packed_intersections(packed_document)
+
+
+@pytest.mark.parametrize("copies", [1, 4])
+def test_simple_guillotine_pack_items_leaving_degenerate_free_rectangles(copies: int):
+    # float residue leaves zero height free rectangle sharing edge with real one,
+    # copies are packed by stamping layout of the first page
+    paper_spec = SimplePaperSpec(size=Size(210, 297), padding=Padding(5, 5, 5, 5))
+    sizes = ([Size(101.0, 146.8), Size(24.7, 21.4)] + [Size(15.3, 62.7)] * 7) * copies
+    unpacked_items = [UnpackedItem(i, size) for i, size in enumerate(sizes)]
+    pack_strategy = SimpleGuillotinePackStrategy(rotation=False)
+
+    packed_document = pack_strategy.pack(paper_spec, unpacked_items)
+
+    assert len(packed_document.pages) == copies
+    assert sorted(item.id for page in packed_document.pages for item in page.items) == list(range(len(sizes)))
+
+
+def test_simple_guillotine_pack_identical_items():
+    paper_spec = SimplePaperSpec(size=Size(210, 297), padding=Padding(5, 5, 5, 5))
+    unpacked_items = [UnpackedItem(i, Size(40, 40)) for i in range(3)] + \
+                     [UnpackedItem(i, Size(63, 88.5)) for i in range(3, 103)]
+    pack_strategy = SimpleGuillotinePackStrategy(rotation=True)
+
+    packed_document = pack_strategy.pack(paper_spec, unpacked_items)
+
+    assert len(packed_document.pages) == 12
+    assert sorted(item.id for page in packed_document.pages for item in page.items) == list(range(103))
+    full_page_layouts = [
+        [(item.position, item.size, item.rotated) for item in page.items]
+        for page in packed_document.pages[:-1]
+    ]
+    assert all(layout == full_page_layouts[0] for layout in full_page_layouts)
+    assert_packed_intersections(packed_document)
+
+
+@pytest.mark.parametrize("rotation", [False, True])
+def test_guillotine_bin_could_fit(rotation: bool):
+    guillotine_bin = GuillotineBin(Size(100, 100), rotation=rotation)
+    guillotine_bin.insert(UnpackedItem(0, Size(100, 70)))
+    guillotine_bin.insert(UnpackedItem(1, Size(90, 30)))
+
+    assert guillotine_bin.max_free_area == 10 * 30
+    assert guillotine_bin.could_fit(UnpackedItem(2, Size(10, 30)))
+    assert guillotine_bin.could_fit(UnpackedItem(3, Size(30, 10))) == rotation
+    assert not guillotine_bin.could_fit(UnpackedItem(4, Size(15, 15)))
+    assert not guillotine_bin.could_fit(UnpackedItem(5, Size(10, 31)))
+
+
+@pytest.mark.parametrize(
+    "sorting,split_heuristic",
+    list(itertools.product(ITEM_SORTINGS, SPLIT_HEURISTICS)),
+)
+def test_simple_guillotine_pack_configurations(sorting: str, split_heuristic: str):
+    paper_spec = SimplePaperSpec(size=Size(210, 297), padding=Padding(5, 5, 5, 5))
+    sizes = [Size(63, 88.5), Size(120, 70), Size(45, 25), Size(25, 25)]
+    unpacked_items = [UnpackedItem(i, sizes[i % len(sizes)]) for i in range(40)]
+    pack_strategy = SimpleGuillotinePackStrategy(rotation=True, sorting=sorting, split_heuristic=split_heuristic)
+
+    packed_document = pack_strategy.pack(paper_spec, unpacked_items)
+
+    assert sorted(item.id for page in packed_document.pages for item in page.items) == list(range(40))
+    assert_packed_intersections(packed_document)
+
+
+def test_simple_guillotine_unsupported_sorting():
+    with pytest.raises(ValueError, match="sorting"):
+        SimpleGuillotinePackStrategy(sorting="color")
+
+
+def test_simple_guillotine_pack_iter_yields_pages_before_packing_finished():
+    paper_spec = SimplePaperSpec(size=Size(210, 297), padding=Padding(5, 5, 5, 5))
+    # free space left by large cards is too small for tokens, so card pages are complete early
+    unpacked_items = [UnpackedItem(i, Size(100, 140), back_exists=True) for i in range(8)]
+    unpacked_items += [UnpackedItem(8 + i, Size(10, 10)) for i in range(1000)]
+    pack_strategy = SimpleGuillotinePackStrategy()
+
+    created_bins = []
+    bin_factory = pack_strategy._bin_factory
+    pack_strategy._bin_factory = lambda work_area: created_bins.append(work_area) or bin_factory(work_area)
+
+    pages = pack_strategy.pack_iter(paper_spec, unpacked_items)
+    first_page = next(pages)
+
+    assert sorted(item.id for item in first_page.items) == [0, 1, 2, 3]
+    first_back_page = next(pages)
+    assert all(isinstance(item, PackedItemBack) for item in first_back_page.items)
+    created_bins_count = len(created_bins)
+
+    rest_pages = list(pages)
+    assert len(created_bins) > created_bins_count
+    assert [first_page, first_back_page] + rest_pages == pack_strategy.pack(paper_spec, unpacked_items).pages
+
+
+def test_simple_guillotine_pack_identical_items_never_skips_item():
+    empty_bin = GuillotineBin(Size(50, 50), rotation=False)
+    items = [UnpackedItem(i, Size(60, 10)) for i in range(3)]
+
+    with pytest.raises(ValueError, match="doesn't fit empty bin"):
+        SimpleGuillotinePackStrategy._pack_identical_items([empty_bin], empty_bin, items, 0)
@@ -0,0 +1,97 @@
+import pytest
+
+from pnp_toolkit.core.binpack.input_types import Size, Position, DuplexSpec, SimplePaperSpec, RollPaperSpec, \
+    Padding, UnpackedItem
+from pnp_toolkit.core.binpack.output_types import PackedPage, PackedItemFront, PackedItemBack
+from pnp_toolkit.core.binpack.strategy.roll_guillotine import RollGuillotinePackStrategy
+from pnp_toolkit.core.binpack.strategy.simple_guillotine import SimpleGuillotinePackStrategy
+from pnp_toolkit.core.binpack.utils import generate_back_page
+
+
+FRONT_ITEMS = [
+    PackedItemFront(position=Position(10, 20), size=Size(60, 90), id=0),
+    PackedItemFront(position=Position(80, 20), size=Size(90, 60), id=1, rotated=True),
+    PackedItemFront(position=Position(10, 120), size=Size(60, 90), id=2),
+]
+
+
+@pytest.mark.parametrize(
+    "page_size,duplex,expected_positions",
+    [
+        (Size(200, 300), DuplexSpec(), [Position(130, 20), Position(30, 20)]),
+        (Size(200, 300), DuplexSpec("long_edge"), [Position(130, 20), Position(30, 20)]),
+        (Size(200, 300), DuplexSpec("short_edge"), [Position(10, 190), Position(80, 220)]),
+        (Size(200, 300), DuplexSpec(offset_x=1.5, offset_y=-2), [Position(131.5, 18), Position(31.5, 18)]),
+        (Size(300, 200), DuplexSpec(), [Position(230, 20), Position(130, 20)]),
+        (Size(300, 200), DuplexSpec("long_edge"), [Position(10, 90), Position(80, 120)]),
+        (Size(300, 200), DuplexSpec("short_edge"), [Position(230, 20), Position(130, 20)]),
+    ],
+)
+def test_generate_back_page(page_size: Size, duplex: DuplexSpec, expected_positions):
+    front_page = PackedPage(page_size, FRONT_ITEMS)
+
+    back_page = generate_back_page(front_page, {0, 1}, duplex, portrait=page_size.width <= page_size.height)
+
+    assert back_page.size == page_size
+    assert all(isinstance(item, PackedItemBack) for item in back_page.items)
+    assert [item.id for item in back_page.items] == [0, 1]
+    assert [item.position for item in back_page.items] == expected_positions
+    assert [item.size for item in back_page.items] == [Size(60, 90), Size(90, 60)]
+    assert [item.rotated for item in back_page.items] == [False, True]
+
+
+def test_generate_back_page_turns_rotated_items():
+    front_page = PackedPage(Size(200, 300), FRONT_ITEMS)
+
+    default_back = generate_back_page(front_page, {1})
+    long_edge_back = generate_back_page(front_page, {1}, DuplexSpec("long_edge"))
+    short_edge_back = generate_back_page(front_page, {1}, DuplexSpec("short_edge"))
+
+    assert list(default_back.columns.rotated) == [-1]
+    assert list(long_edge_back.columns.rotated) == [-1]
+    assert list(short_edge_back.columns.rotated) == [1]
+
+
+@pytest.mark.parametrize(
+    "paper_spec",
+    [
+        SimplePaperSpec(Size(297, 210), Padding(0, 0, 0, 0), DuplexSpec("long_edge")),
+        RollPaperSpec(300, Padding(0, 0, 0, 0), DuplexSpec("long_edge")),
+    ],
+)
+def test_paper_orientation_decides_long_edge_flip(paper_spec):
+    # roll page is wider than long here, but roll is still fed along its length
+    page_size = Size(300, 250) if isinstance(paper_spec, RollPaperSpec) else paper_spec.size
+    front_page = PackedPage(page_size, FRONT_ITEMS)
+
+    back_page = generate_back_page(front_page, {0}, paper_spec.duplex, paper_spec.portrait)
+
+    if paper_spec.portrait:
+        assert back_page.items[0].position == Position(page_size.width - 10 - 60, 20)
+    else:
+        assert back_page.items[0].position == Position(10, page_size.height - 20 - 90)
+
+
+@pytest.mark.parametrize(
+    "pack_strategy,paper_spec",
+    [
+        (SimpleGuillotinePackStrategy(), SimplePaperSpec(Size(297, 210), Padding(5, 5, 5, 5))),
+        (RollGuillotinePackStrategy(), RollPaperSpec(250, Padding(5, 5, 5, 5))),
+    ],
+)
+def test_backs_mirrored_left_to_right_by_default(pack_strategy, paper_spec):
+    # landscape sheets and short rolls (wider than long) are mirrored left to right too
+    items = [UnpackedItem(idx, Size(63, 88), back_exists=True) for idx in range(3)]
+
+    front_page, back_page = pack_strategy.pack(paper_spec, items).pages
+
+    assert front_page.size.width > front_page.size.height
+    fronts = {item.id: item for item in front_page.items}
+    for back in back_page.items:
+        front = fronts[back.id]
+        assert back.position == Position(front_page.size.width - front.position.x - front.size.width, front.position.y)
+
+
+def test_duplex_spec_validates_flip():
+    with pytest.raises(ValueError):
+        DuplexSpec("diagonal")
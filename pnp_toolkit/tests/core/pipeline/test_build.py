@@ -0,0 +1,101 @@
+from pathlib import Path
+
+from PIL import Image
+
+from pnp_toolkit.core.pipeline.build import BuildPipeline
+from pnp_toolkit.core.spec.yaml_parse import parse_from_yaml
+
+
+SPEC_CONTENT = """
+spec_version: "1.0"
+project_name: "test"
+variables:
+  edition: "{edition}"
+output:
+  directory: "out"
+  format: "{{{{doc_name}}}}_{{{{edition}}}}.pdf"
+documents:
+  - name: "cards"
+    src: ["."]
+    paper: "a4"
+    pack_strategy: "simple_guillotine"
+    components:
+      - name: "card"
+        size: "63*88mm"
+        front_images:
+          src: ["cards/*.png"]
+"""
+
+
+# second document with the same cards, so documents are built by several worker processes
+SECOND_DOCUMENT_CONTENT = """
+  - name: "cards_copy"
+    src: ["."]
+    paper: "a4"
+    pack_strategy: "simple_guillotine"
+    components:
+      - name: "card"
+        size: "63*88mm"
+        front_images:
+          src: ["cards/*.png"]
+"""
+
+
+def _make_project(project_path: Path):
+    cards_path = project_path / "cards"
+    cards_path.mkdir()
+    for idx in range(3):
+        Image.new("RGB", (63, 88), (idx * 50, 0, 0)).save(cards_path / f"card_{idx}.png")
+
+
+def _build(spec_content: str, **pipeline_params) -> list:
+    statuses = []
+    pipeline_params.setdefault("max_concurrency", 1)
+    pipeline = BuildPipeline(**pipeline_params)
+    pipeline.on_process_status_changed(lambda doc, completion, status: statuses.append((doc.name, status)))
+    pipeline.process_all(parse_from_yaml(spec_content))
+    return statuses
+
+
+def test_build_pipeline_rebuilds_document_when_variable_changed(tmp_path: Path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _make_project(tmp_path)
+
+    _build(SPEC_CONTENT.format(edition="first"))
+    assert (tmp_path / "out" / "cards_first.pdf").exists()
+
+    assert _build(SPEC_CONTENT.format(edition="first")) == [("cards", "up to date")]
+
+    statuses = _build(SPEC_CONTENT.format(edition="second"))
+    assert ("cards", "up to date") not in statuses
+    assert (tmp_path / "out" / "cards_second.pdf").exists()
+
+
+def test_build_pipeline_process_executor(tmp_path: Path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _make_project(tmp_path)
+    spec = parse_from_yaml(SPEC_CONTENT.format(edition="first") + SECOND_DOCUMENT_CONTENT)
+
+    statuses = []
+    metrics = {}
+    pipeline = BuildPipeline(max_concurrency=2, executor="process")
+    pipeline.on_process_status_changed(lambda doc, completion, status: statuses.append((doc.name, completion, status)))
+    pipeline.on_document_metrics(lambda doc, doc_metrics: metrics.setdefault(doc.name, doc_metrics))
+    pipeline.process_all(spec)
+
+    for doc_name in ("cards", "cards_copy"):
+        output_path = tmp_path / "out" / f"{doc_name}_first.pdf"
+        assert output_path.read_bytes().startswith(b"%PDF")
+
+        # events sent by worker process are re-emitted in parent in order
+        doc_statuses = [(completion, status) for name, completion, status in statuses if name == doc_name]
+        assert doc_statuses[0] == (0.0, "prepare document for process")
+        assert doc_statuses[-1] == (1.0, "complete")
+        assert metrics[doc_name]["name"] == doc_name
+        assert metrics[doc_name]["bytes_written"] == output_path.stat().st_size
+        assert metrics[doc_name]["error"] is None
+
+    # manifest is updated by parent process from worker results
+    assert _build(SPEC_CONTENT.format(edition="first") + SECOND_DOCUMENT_CONTENT, executor="process") == [
+        ("cards", "up to date"), ("cards_copy", "up to date"),
+    ]
@@ -0,0 +1,54 @@
+import os
+from pathlib import Path
+
+from pnp_toolkit.core.pipeline.manifest import BuildManifest, document_fingerprint
+from pnp_toolkit.core.spec.yaml_parse import parse_from_yaml
+
+
+SPEC_CONTENT = """
+spec_version: "1.0"
+documents:
+  - name: "test_doc"
+    src: ["test_src"]
+    pack_strategy: "simple_guillotine"
+    components:
+      - name: "test_com"
+        size: "30*45mm"
+        front_images:
+          src: ["*.png"]
+"""
+
+
+def test_document_fingerprint_tracks_inputs(tmp_path: Path):
+    spec = parse_from_yaml(SPEC_CONTENT)
+    doc = spec.documents[0]
+    image_path = tmp_path / "image.png"
+    image_path.write_bytes(b"content")
+
+    fingerprint = document_fingerprint(doc, spec, [image_path])
+    assert fingerprint == document_fingerprint(doc, spec, [image_path])
+
+    os.utime(image_path, ns=(0, 0))
+    assert fingerprint != document_fingerprint(doc, spec, [image_path])
+
+    other_spec = parse_from_yaml(SPEC_CONTENT.replace("30*45mm", "30*46mm"))
+    assert document_fingerprint(doc, spec, [image_path]) != \
+        document_fingerprint(other_spec.documents[0], other_spec, [image_path])
+
+
+def test_build_manifest_roundtrip(tmp_path: Path):
+    manifest_path = tmp_path / "manifest.json"
+    output_path = tmp_path / "doc.pdf"
+
+    manifest = BuildManifest(manifest_path)
+    manifest.update("doc", "fingerprint", output_path)
+    manifest.save()
+
+    manifest = BuildManifest(manifest_path)
+    # output is not created yet
+    assert not manifest.is_up_to_date("doc", "fingerprint")
+
+    output_path.write_bytes(b"")
+    assert manifest.is_up_to_date("doc", "fingerprint")
+    assert not manifest.is_up_to_date("doc", "other_fingerprint")
+    assert not manifest.is_up_to_date("other_doc", "fingerprint")
@@ -0,0 +1,57 @@
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from pnp_toolkit.core.binpack.input_types import Size
+from pnp_toolkit.core.pipeline.probe import probe_image, probe_images, warn_aspect_ratio_mismatches
+
+
+def _make_image(path: Path, size, mode: str = "RGB", **save_params) -> Path:
+    Image.new(mode, size).save(path, **save_params)
+    return path
+
+
+def test_probe_image_reads_header(tmp_path: Path):
+    image_path = _make_image(tmp_path / "card.jpg", (630, 885), dpi=(300, 300))
+
+    probe = probe_image(image_path)
+
+    assert (probe.width, probe.height) == (630, 885)
+    assert probe.mode == "RGB"
+    assert probe.format == "JPEG"
+    assert probe.dpi == pytest.approx((300, 300))
+
+
+def test_probe_images_deduplicates_paths(tmp_path: Path):
+    card_path = _make_image(tmp_path / "card.png", (63, 88))
+    token_path = _make_image(tmp_path / "token.png", (40, 40), mode="RGBA")
+
+    probes = probe_images([card_path, token_path, card_path])
+
+    assert list(probes) == [card_path, token_path]
+    assert probes[token_path].mode == "RGBA"
+    assert probes[token_path].decoded_size == 40 * 40 * 4
+    assert probes[card_path].decoded_size == 63 * 88 * 3
+
+
+def test_probe_images_fails_on_broken_image(tmp_path: Path):
+    broken_path = tmp_path / "broken.png"
+    broken_path.write_bytes(b"not an image")
+
+    with pytest.raises(ValueError, match="broken.png"):
+        probe_images([_make_image(tmp_path / "card.png", (63, 88)), broken_path])
+
+
+def test_warn_aspect_ratio_mismatches(tmp_path: Path):
+    card_path = _make_image(tmp_path / "card.png", (630, 880))
+    landscape_path = _make_image(tmp_path / "landscape.png", (880, 630))
+    probes = probe_images([card_path, landscape_path])
+
+    mismatched = warn_aspect_ratio_mismatches(probes, [
+        (card_path, Size(63, 88.5)),
+        (landscape_path, Size(63, 88.5)),
+        (landscape_path, Size(63, 88.5)),
+    ])
+
+    assert mismatched == [landscape_path]
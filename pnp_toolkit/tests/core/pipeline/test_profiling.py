@@ -0,0 +1,46 @@
+import pstats
+import threading
+import time
+from pathlib import Path
+
+from pnp_toolkit.core.pipeline.profiling import DocumentProfiler
+
+
+def _busy_loop(seconds: float):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        sum(range(100))
+
+
+def _produce_pages(count: int):
+    for page in range(count):
+        _busy_loop(0.02)
+        yield page
+
+
+def test_document_profiler_saves_pstats_and_collapsed_stacks(tmp_path: Path):
+    profiler = DocumentProfiler(interval=0.001)
+    produced_pages = []
+
+    profiler.start()
+    # pages are produced in other thread, as pack producer of document does
+    producer = threading.Thread(target=lambda: produced_pages.extend(profiler.profile_iter(_produce_pages(3))))
+    producer.start()
+    _busy_loop(0.05)
+    producer.join()
+    profiler.stop()
+
+    pstats_path, collapsed_path = profiler.save(tmp_path / "doc.pdf")
+
+    assert produced_pages == [0, 1, 2]
+    assert pstats_path == tmp_path / "doc.pdf.pstats"
+    function_names = {name for _, _, name in pstats.Stats(str(pstats_path)).stats}
+    assert {"_busy_loop", "_produce_pages"} <= function_names
+
+    assert collapsed_path == tmp_path / "doc.pdf.collapsed.txt"
+    stacks = collapsed_path.read_text().splitlines()
+    assert stacks
+    for stack_line in stacks:
+        stack, count = stack_line.rsplit(" ", 1)
+        assert int(count) > 0
+    assert any("_busy_loop (test_profiling.py:" in stack_line for stack_line in stacks)
@@ -0,0 +1,45 @@
+import threading
+
+import pytest
+
+from pnp_toolkit.core.pipeline.stages import iterate_in_background, StageExecutors
+
+
+def test_iterate_in_background_keeps_order():
+    assert list(iterate_in_background(iter(range(100)), max_size=2)) == list(range(100))
+
+
+def test_iterate_in_background_is_bounded():
+    produced = []
+
+    def values():
+        for value in range(10):
+            produced.append(value)
+            yield value
+
+    background_values = iterate_in_background(values(), max_size=2)
+    assert next(background_values) == 0
+
+    # producer is blocked by full queue until consumer takes next value
+    threading.Event().wait(0.3)
+    assert len(produced) <= 4
+
+    background_values.close()
+
+
+def test_iterate_in_background_raises_producer_error():
+    def values():
+        yield 1
+        raise ValueError("broken item")
+
+    background_values = iterate_in_background(values())
+    assert next(background_values) == 1
+    with pytest.raises(ValueError, match="broken item"):
+        next(background_values)
+
+
+def test_stage_executors_defaults():
+    with StageExecutors(cpu_workers=2) as stage_executors:
+        assert stage_executors.cpu_workers == 2
+        assert stage_executors.io_workers >= 1
+        assert stage_executors.io.submit(sum, [1, 2]).result() == 3
@@ -0,0 +1,48 @@
+import os
+from pathlib import Path
+
+from pnp_toolkit.core.render.image_cache import ImageCache
+from pnp_toolkit.core.render.types import ImageHandle
+
+
+def test_image_cache_key_depends_on_content_and_transformations(tmp_path: Path):
+    image_path = tmp_path / "image.png"
+    image_path.write_bytes(b"first content")
+    cache = ImageCache(tmp_path / "cache")
+
+    key = cache.make_key(ImageHandle(image_path), encoding="png")
+    assert key == cache.make_key(ImageHandle(image_path), encoding="png")
+    assert key != cache.make_key(ImageHandle(image_path, mirror_vertical=True), encoding="png")
+    assert key != cache.make_key(ImageHandle(image_path), encoding="jpeg")
+
+    image_path.write_bytes(b"second content")
+    assert key != cache.make_key(ImageHandle(image_path), encoding="png")
+
+
+def test_image_cache_evicts_least_recently_used(tmp_path: Path):
+    cache = ImageCache(tmp_path, max_size=250)
+
+    cache.put("aa01", b"1" * 100)
+    cache.put("aa02", b"2" * 100)
+    # make first entry older than second one
+    os.utime(cache._entry_path("aa01"), (1, 1))
+    os.utime(cache._entry_path("aa02"), (2, 2))
+    assert cache.get("aa01") == b"1" * 100
+
+    cache.put("aa03", b"3" * 100)
+
+    assert cache.get("aa01") == b"1" * 100
+    assert cache.get("aa02") is None
+    assert cache.get("aa03") == b"3" * 100
+
+
+def test_image_cache_put_same_entry_again_keeps_total_size(tmp_path: Path):
+    cache = ImageCache(tmp_path, max_size=250)
+
+    for _ in range(3):
+        cache.put("aa01", b"1" * 100)
+    cache.put("aa02", b"2" * 100)
+
+    assert cache._total_size == 200
+    assert cache.get("aa01") == b"1" * 100
+    assert cache.get("aa02") == b"2" * 100
@@ -0,0 +1,209 @@
+from pathlib import Path
+from typing import Dict
+
+import pytest
+from PIL import Image
+from reportlab import rl_config
+
+from pnp_toolkit.core.binpack.input_types import SimplePaperSpec, Size, Padding, UnpackedItem
+from pnp_toolkit.core.binpack.strategy.simple_guillotine import SimpleGuillotinePackStrategy
+from pnp_toolkit.core.metrics import DocumentMetrics
+from pnp_toolkit.core.render.image_cache import ImageCache
+from pnp_toolkit.core.render.pdf import PDFOutputRenderer, PDFImageStream
+from pnp_toolkit.core.render.types import RenderDocumentFlow, ImageHandle
+from pnp_toolkit.core.utils import MemoryBudget
+
+
+class TrackingMemoryBudget(MemoryBudget):
+    def __init__(self, limit: int):
+        super().__init__(limit)
+        self.max_used = 0
+
+    def acquire(self, amount: int, block: bool = True) -> bool:
+        acquired = super().acquire(amount, block)
+        self.max_used = max(self.max_used, self.used)
+        return acquired
+
+
+def test_pdf_renderer_keeps_images_within_memory_budget(tmp_path: Path):
+    images = {}
+    decoded_sizes = {}
+    for idx in range(12):
+        image_path = tmp_path / f"card_{idx}.png"
+        Image.new("RGB", (63, 88), (idx * 20, 0, 0)).save(image_path)
+        images[idx] = ImageHandle(image_path)
+        decoded_sizes[image_path] = 63 * 88 * 3
+
+    paper_spec = SimplePaperSpec(size=Size(70, 100), padding=Padding(0, 0, 0, 0))
+    items = [UnpackedItem(idx, Size(63, 88)) for idx in range(12)]
+    pages = SimpleGuillotinePackStrategy().pack_iter(paper_spec, items)
+
+    memory_budget = TrackingMemoryBudget(limit=2 * 63 * 88 * 3)
+    output_path = tmp_path / "out.pdf"
+    metrics = DocumentMetrics("cards")
+    renderer = PDFOutputRenderer(output_path, max_workers=4, memory_budget=memory_budget, metrics=metrics)
+    renderer.render(RenderDocumentFlow(pages=pages, front_images=images, back_images={},
+                                       decoded_sizes=decoded_sizes))
+
+    assert output_path.read_bytes().count(b"/Type /Page\n") == 12
+    assert memory_budget.max_used <= 2 * 63 * 88 * 3
+    assert memory_budget.used == 0
+
+    assert metrics.counters["images_decoded"] == 12
+    assert metrics.counters["bytes_written"] == output_path.stat().st_size
+    assert metrics.stages["write"].calls == 13
+
+
+def _render_cards(tmp_path: Path, output_name: str, images: Dict[int, ImageHandle], **renderer_params) -> Path:
+    paper_spec = SimplePaperSpec(size=Size(70, 100), padding=Padding(0, 0, 0, 0))
+    items = [UnpackedItem(idx, Size(63, 88)) for idx in images]
+    pages = SimpleGuillotinePackStrategy().pack_iter(paper_spec, items)
+
+    output_path = tmp_path / output_name
+    PDFOutputRenderer(output_path, **renderer_params).render(
+        RenderDocumentFlow(pages=pages, front_images=images, back_images={}),
+    )
+    return output_path
+
+
+def test_pdf_renderer_embeds_cached_image_streams_without_decoding(tmp_path: Path, monkeypatch):
+    # no timestamps and random ids, so documents could be compared byte by byte
+    monkeypatch.setattr(rl_config, "invariant", 1)
+    opaque_path = tmp_path / "opaque.png"
+    Image.new("RGB", (63, 88), (200, 10, 10)).save(opaque_path)
+    transparent_path = tmp_path / "transparent.png"
+    Image.new("RGBA", (63, 88), (10, 10, 200, 100)).save(transparent_path)
+    images = {0: ImageHandle(opaque_path), 1: ImageHandle(transparent_path)}
+    image_cache = ImageCache(tmp_path / "cache")
+
+    first_metrics = DocumentMetrics("first")
+    first_path = _render_cards(tmp_path, "first.pdf", images, image_cache=image_cache, metrics=first_metrics)
+    second_metrics = DocumentMetrics("second")
+    second_path = _render_cards(tmp_path, "second.pdf", images, image_cache=image_cache, metrics=second_metrics)
+
+    assert first_metrics.counters["images_decoded"] == 2
+    assert second_metrics.counters["images_decoded"] == 0
+    assert second_metrics.counters["image_cache_hits"] == 2
+    assert first_path.read_bytes() == second_path.read_bytes()
+    # only transparent image gets soft mask
+    assert second_path.read_bytes().count(b"/SMask") == 1
+
+
+def test_pdf_image_stream_round_trip():
+    image_stream = PDFImageStream(
+        width=2, height=1, color_space="DeviceCMYK", filter="DCTDecode",
+        data=b"\n\x00data", alpha=b"alpha\n", decode=[1, 0, 1, 0, 1, 0, 1, 0],
+    )
+
+    assert PDFImageStream.from_bytes(image_stream.to_bytes()) == image_stream
+    assert PDFImageStream.from_bytes(PDFImageStream(1, 1, "DeviceGray", "FlateDecode", b"").to_bytes()).alpha is None
+
+
+def _save_image(path: Path, mode: str, color, **save_params) -> Path:
+    Image.new(mode, (63, 88), color).save(path, **save_params)
+    return path
+
+
+def test_pdf_renderer_passthrough_embeds_jpeg_without_decoding(tmp_path: Path):
+    jpeg_path = _save_image(tmp_path / "card.jpg", "RGB", (200, 10, 10), quality=80)
+    metrics = DocumentMetrics("cards")
+
+    output_path = _render_cards(tmp_path, "out.pdf", {0: ImageHandle(jpeg_path)}, encoding="passthrough",
+                                metrics=metrics)
+
+    pdf = output_path.read_bytes()
+    assert jpeg_path.read_bytes() in pdf
+    assert pdf.count(b"/DCTDecode") == 1
+    assert metrics.counters["images_decoded"] == 0
+
+
+def test_pdf_renderer_passthrough_marks_adobe_cmyk_jpeg_inverted(tmp_path: Path):
+    # pillow writes cmyk jpeg inverted with APP14 "Adobe" segment, as adobe applications do
+    jpeg_path = _save_image(tmp_path / "card.jpg", "CMYK", (0, 200, 200, 0))
+
+    output_path = _render_cards(tmp_path, "out.pdf", {0: ImageHandle(jpeg_path)}, encoding="passthrough")
+
+    pdf = output_path.read_bytes()
+    assert pdf.count(b"/DCTDecode") == 1
+    assert b"/Decode [ 1 0 1 0 1 0 1 0 ]" in pdf
+
+
+@pytest.mark.parametrize(
+    "image_name,mode,mirror_horizontal,encoding,embedded_as_jpeg",
+    [
+        ("card.png", "RGB", False, "passthrough", False),
+        ("card.jpg", "RGB", True, "passthrough", False),
+        ("card.png", "RGB", False, "jpeg", True),
+        ("card.png", "RGBA", False, "jpeg", False),
+        ("card.jpg", "RGB", False, "png", False),
+    ],
+)
+def test_pdf_renderer_image_encodings(tmp_path: Path, image_name: str, mode: str, mirror_horizontal: bool,
+                                      encoding: str, embedded_as_jpeg: bool):
+    image_path = _save_image(tmp_path / image_name, mode, (200, 10, 10, 100)[:len(mode)])
+    images = {0: ImageHandle(image_path, mirror_horizontal=mirror_horizontal)}
+
+    output_path = _render_cards(tmp_path, "out.pdf", images, encoding=encoding)
+
+    pdf = output_path.read_bytes()
+    assert b"/Subtype /Image" in pdf
+    assert (b"/DCTDecode" in pdf) == embedded_as_jpeg
+    if image_name.endswith(".jpg"):
+        # transformed or reencoded source is never embedded as is
+        assert image_path.read_bytes() not in pdf
+
+
+def test_pdf_renderer_embeds_each_distinct_image_once(tmp_path: Path, monkeypatch):
+    loaded_images = []
+    load_image = ImageHandle.load
+
+    def load_tracked(image, *args, **kwargs):
+        loaded_images.append(image)
+        return load_image(image, *args, **kwargs)
+
+    monkeypatch.setattr(ImageHandle, "load", load_tracked)
+    card_path = _save_image(tmp_path / "card.png", "RGB", (200, 10, 10))
+    # equal handles created for every item, as build pipeline does
+    images = {idx: ImageHandle(card_path) for idx in range(5)}
+
+    output_path = _render_cards(tmp_path, "out.pdf", images)
+
+    pdf = output_path.read_bytes()
+    assert pdf.count(b"/Type /Page\n") == 5
+    assert pdf.count(b"/Subtype /Image") == 1
+    assert len(loaded_images) == 1
+
+
+def test_pdf_renderer_output_does_not_depend_on_workers_count(tmp_path: Path, monkeypatch):
+    # no timestamps and random ids, so documents could be compared byte by byte
+    monkeypatch.setattr(rl_config, "invariant", 1)
+    images = {
+        idx: ImageHandle(_save_image(tmp_path / f"card_{idx}.png", "RGB", (idx * 20, 0, 0)))
+        for idx in range(10)
+    }
+
+    sequential_path = _render_cards(tmp_path, "sequential.pdf", images, max_workers=1)
+    parallel_path = _render_cards(tmp_path, "parallel.pdf", images, max_workers=4)
+
+    assert parallel_path.read_bytes() == sequential_path.read_bytes()
+
+
+@pytest.mark.parametrize(
+    "source_size,embedded_size",
+    [
+        # 63x88mm at 50 dpi
+        ((630, 880), (124, 173)),
+        # low resolution image is never upscaled
+        ((20, 28), (20, 28)),
+    ],
+)
+def test_pdf_renderer_downsamples_images_to_dpi(tmp_path: Path, source_size, embedded_size):
+    card_path = tmp_path / "card.png"
+    Image.new("RGB", source_size, (200, 10, 10)).save(card_path)
+
+    output_path = _render_cards(tmp_path, "out.pdf", {0: ImageHandle(card_path)}, dpi=50)
+
+    pdf = output_path.read_bytes()
+    assert pdf.count(b"/Subtype /Image") == 1
+    assert f"/Height {embedded_size[1]}".encode() in pdf
+    assert f"/Width {embedded_size[0]}".encode() in pdf
@@ -0,0 +1,24 @@
+from pnp_toolkit.core.bench import synthetic_decks, run_benchmarks
+
+
+def test_synthetic_decks_are_reproducible():
+    first_decks = synthetic_decks(scale=0.1)
+    second_decks = synthetic_decks(scale=0.1)
+
+    assert [deck.name for deck in first_decks] == ["uniform_cards", "mixed_sizes", "tiny_stickers_x9", "huge_roll"]
+    assert [deck.items() for deck in first_decks] == [deck.items() for deck in second_decks]
+
+
+def test_run_benchmarks_reports_pack_and_render():
+    decks = [deck for deck in synthetic_decks(scale=0.02) if deck.name in ("uniform_cards", "tiny_stickers_x9")]
+
+    report = run_benchmarks(decks, repeat=1)
+
+    results = report["results"]
+    assert [(result["benchmark"], result["deck"]) for result in results] == [
+        ("pack", "uniform_cards")] * 4 + [("render", "uniform_cards")] + \
+        [("pack", "tiny_stickers_x9")] * 4 + [("render", "tiny_stickers_x9")]
+    for result in results:
+        assert result["pages"] >= 1
+        assert 0 < result["paper_utilization"] <= 1
+        assert result["items_per_sec"] > 0
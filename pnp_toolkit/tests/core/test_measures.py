@@ -10,6 +10,7 @@ import pytest
         (" 5.111 mm  ", 5.111, "mm"),
         ("5 in", 5, "in"),
         ("7", 7.0, None),
+        ("-0.5mm", -0.5, "mm"),
     ],
 )
 def test_parse_raw_measure(measure_str, expected_value, expected_unit):
@@ -0,0 +1,40 @@
+import pytest
+
+from pnp_toolkit.core.binpack.input_types import Size, Position
+from pnp_toolkit.core.binpack.output_types import PackedPage, PackedItemFront
+from pnp_toolkit.core.metrics import DocumentMetrics, counted_pages, METRIC_STAGES
+
+
+def test_document_metrics_measures_stages_and_counters():
+    metrics = DocumentMetrics("doc")
+
+    with metrics.measure("glob"):
+        sum(range(1000))
+    with pytest.raises(ValueError):
+        with metrics.measure("decode"):
+            raise ValueError("broken image")
+    metrics.count("bytes_read", 100)
+    metrics.count("bytes_read", 20)
+    metrics.finish(ValueError("broken image"))
+
+    content = metrics.to_json()
+    assert list(content["stages"]) == METRIC_STAGES
+    assert content["stages"]["glob"]["calls"] == 1
+    assert content["stages"]["decode"]["calls"] == 1
+    assert content["stages"]["pack"]["calls"] == 0
+    assert content["bytes_read"] == 120
+    assert content["error"] == "broken image"
+
+
+def test_document_metrics_measures_iteration_and_pages():
+    metrics = DocumentMetrics("doc")
+    pages = [
+        PackedPage(Size(100, 100), [PackedItemFront(Position(0, 0), Size(50, 100), 0)]),
+        PackedPage(Size(100, 100), [PackedItemFront(Position(0, 0), Size(50, 50), 1)]),
+    ]
+
+    assert list(counted_pages(metrics, metrics.measure_iter("pack", pages))) == pages
+
+    assert metrics.stages["pack"].calls == 3
+    assert metrics.pages == 2
+    assert metrics.paper_utilization == pytest.approx(0.375)
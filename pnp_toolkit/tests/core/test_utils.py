@@ -0,0 +1,98 @@
+import os
+from glob import glob
+from pathlib import Path
+
+import pytest
+
+from pnp_toolkit.core.utils import parse_size_bytes, resolve_glob_pathes, DirectoryScanCache, MemoryBudget
+
+
+@pytest.mark.parametrize(
+    "raw_size,expected_size",
+    [
+        ("100", 100),
+        (100, 100),
+        ("2KB", 2048),
+        ("1.5 mb", 1572864),
+        ("4GB", 4 * 1024 ** 3),
+    ],
+)
+def test_parse_size_bytes(raw_size, expected_size):
+    assert parse_size_bytes(raw_size) == expected_size
+
+
+@pytest.mark.parametrize("raw_size", ["", "MB", "12 parsecs"])
+def test_parse_size_bytes_invalid(raw_size):
+    with pytest.raises(ValueError):
+        parse_size_bytes(raw_size)
+
+
+@pytest.fixture
+def image_tree(tmp_path: Path, monkeypatch) -> Path:
+    for relative_path in [
+        "cards/a/front_1.png", "cards/a/front_2.png", "cards/a/back.png", "cards/a/.hidden.png",
+        "cards/b/front_1.png", "cards/b/notes.txt", "tokens/token.png",
+    ]:
+        (tmp_path / relative_path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / relative_path).write_bytes(b"")
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.mark.parametrize(
+    "glob_pathes",
+    [
+        ["cards/*/front_*.png"],
+        ["cards/a/*.png", "cards/*/front_1.png", "tokens/*"],
+        ["cards/a/.*", "cards/?/notes.txt", "cards/[ab]/back.png"],
+        ["cards/a/back.png", "cards/missing/*.png", "cards/a/back.png/*", "./tokens/*.png"],
+        ["cards/*/", "*"],
+        # repeated separators are kept as written before first pattern part only
+        ["cards//a/*.png", "cards//*//front_1.png", "cards/a//back.png", "cards//b/", ".//tokens/*"],
+    ],
+)
+def test_resolve_glob_pathes_matches_glob(image_tree: Path, glob_pathes):
+    expected = sorted({path for glob_path in glob_pathes for path in glob(glob_path)})
+    assert resolve_glob_pathes(glob_pathes) == expected
+
+    absolute_glob_pathes = [os.path.join(str(image_tree), glob_path) for glob_path in glob_pathes]
+    absolute_expected = sorted({path for glob_path in absolute_glob_pathes for path in glob(glob_path)})
+    assert resolve_glob_pathes(absolute_glob_pathes) == absolute_expected
+
+
+def test_resolve_glob_pathes_scans_directory_once(image_tree: Path, monkeypatch):
+    scanned_directories = []
+    scandir = os.scandir
+    monkeypatch.setattr(os, "scandir", lambda path: scanned_directories.append(path) or scandir(path))
+    scan_cache = DirectoryScanCache()
+
+    resolve_glob_pathes(["cards/*/front_*.png", "cards/*/back.png", "cards/a/*.png"], scan_cache)
+    resolve_glob_pathes(["cards/b/*.txt"], scan_cache)
+
+    assert sorted(scanned_directories) == sorted(["cards", os.path.join("cards", "a"), os.path.join("cards", "b")])
+
+
+def test_memory_budget_admits_within_limit():
+    budget = MemoryBudget(100)
+
+    assert budget.acquire(60)
+    assert not budget.acquire(50, block=False)
+    assert budget.acquire(40, block=False)
+
+    budget.release(60)
+    assert budget.acquire(50, block=False)
+    assert budget.used == 90
+
+
+def test_memory_budget_admits_oversized_amount_alone():
+    budget = MemoryBudget(100)
+
+    assert budget.acquire(10)
+    assert not budget.acquire(500, block=False)
+
+    budget.release(10)
+    assert budget.acquire(500, block=False)
+    budget.release(500)
+    assert budget.used == 0
+
+    assert MemoryBudget().acquire(500, block=False)